@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Reasoning benchmark - compares single-request and stepwise reasoning against the local
+fake model, counting round trips and the prompt tokens resent with the history
+"""
+
+
+import argparse
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import Dict, List
+
+from fake_model import FakeGenerativeModel
+from reasoning import ReasoningRunner
+from tokenizer import TokenizerApp
+
+
+SYSTEM_PROMPT = "You are an AI assistant who is expert in breaking down complex problems. " * 8
+
+
+def make_replies(thinks: int) -> List[str]:
+    """Scripted step objects: analyse, N thinks, output, validate, result"""
+    steps = [("analyse", "The user is asking for the sum of two numbers.")]
+    steps += [("think", f"Considering the problem from angle {i + 1} before answering.") for i in range(thinks)]
+    steps += [
+        ("output", "4"),
+        ("validate", "Double-checking: 2 + 2 equals 4, so the output is correct."),
+        ("result", "2 + 2 = 4, calculated by adding the operands."),
+    ]
+    return [json.dumps({"step": step, "content": content}) for step, content in steps]
+
+
+def run_mode(app: TokenizerApp, mode: str, thinks: int, delay: float, latency: float) -> Dict:
+    chat = FakeGenerativeModel(replies=make_replies(thinks), delay=delay, latency=latency).start_chat()
+    chat.send_message(SYSTEM_PROMPT)
+
+    start = time.perf_counter()
+    runner = ReasoningRunner(chat, mode=mode)
+    steps = 0
+    for parsed in runner.steps("What is 2 + 2"):
+        steps += 1
+        if parsed.get("step") == "result":
+            break
+    elapsed = time.perf_counter() - start
+
+    query_requests = chat.requests[1:]  # Skip the system prompt, which both modes send
+    return {
+        "mode": mode,
+        "steps": steps,
+        "round_trips": runner.round_trips,
+        "prompt_tokens": sum(app.count_batch(query_requests)),
+        "time_s": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-request vs stepwise reasoning")
+    parser.add_argument("--model", "-m", type=str, default="gpt-3.5-turbo",
+                        help="Model whose tokenizer counts the prompt tokens")
+    parser.add_argument("--thinks", type=int, default=5,
+                        help="Number of think steps in the scripted chain")
+    parser.add_argument("--delay", type=float, default=0.01,
+                        help="Fake model latency per streamed chunk in seconds")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Fake model latency per round trip before the first chunk in seconds")
+    args = parser.parse_args()
+
+    app = TokenizerApp()
+    with redirect_stdout(sys.stderr):
+        app.load_tokenizer(args.model)
+
+    results = [run_mode(app, mode, args.thinks, args.delay, args.latency) for mode in ("stepwise", "single")]
+
+    print(f"\n--- Reasoning benchmark ({args.thinks} think steps, {args.latency * 1000:.0f}ms per round trip, "
+          f"{args.delay * 1000:.0f}ms per chunk) ---")
+    for result in results:
+        print(f"{result['mode']:<10} {result['steps']} steps  {result['round_trips']} round trips  "
+              f"{result['prompt_tokens']:,} prompt tokens  {result['time_s']:.3f}s")
+
+    stepwise, single = results
+    print(f"Round trips saved: {stepwise['round_trips'] - single['round_trips']}  "
+          f"Prompt tokens saved: {stepwise['prompt_tokens'] - single['prompt_tokens']:,} "
+          f"({1 - single['prompt_tokens'] / stepwise['prompt_tokens']:.0%})  "
+          f"Speedup: {stepwise['time_s'] / single['time_s']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Session benchmark - compares sending the system prompt as a chat message with setting it once as a
+model-level system instruction, against the local fake model
+"""
+
+
+import argparse
+import sys
+import time
+from contextlib import redirect_stdout
+from functools import partial
+from typing import Dict
+
+from bench_reasoning import make_replies
+from fake_model import FakeGenerativeModel
+from reasoning import ReasoningRunner
+from session_builder import SessionBuilder
+from tokenizer import TokenizerApp
+
+
+SYSTEM_PROMPT = "You are an AI assistant who is expert in breaking down complex problems. " * 8
+QUESTIONS = ["What is 2 + 2", "What is 3 * 10", "What is 12 / 4", "What is 7 - 5"]
+
+
+def reasoning_session(app: TokenizerApp, mode: str, thinks: int, delay: float, latency: float) -> Dict:
+    """One reasoning query, timed from the start of the session to the result"""
+    fake = partial(FakeGenerativeModel, replies=make_replies(thinks), delay=delay, latency=latency)
+
+    start = time.perf_counter()
+    if mode == "message":
+        chat = fake().start_chat()
+        chat.send_message(SYSTEM_PROMPT)
+    else:
+        chat = fake(system_instruction=SYSTEM_PROMPT).start_chat()
+
+    runner = ReasoningRunner(chat)
+    for parsed in runner.steps("What is 2 + 2"):
+        if parsed.get("step") == "result":
+            break
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "round_trips": len(chat.requests),
+        "prompt_tokens": sum(app.count_batch(chat.requests)),
+        "time_s": elapsed,
+    }
+
+
+def prefixed_chat(app: TokenizerApp, mode: str, latency: float) -> Dict:
+    """Several questions in one session, as chat_2.py sends them"""
+    start = time.perf_counter()
+    if mode == "message":
+        chat = FakeGenerativeModel(replies=[], delay=0.0, latency=latency).start_chat()
+        for question in QUESTIONS:
+            chat.send_message(f"{SYSTEM_PROMPT}\n\nUser: {question}")
+    else:
+        chat = FakeGenerativeModel(replies=[], delay=0.0, latency=latency,
+                                   system_instruction=SYSTEM_PROMPT).start_chat()
+        for question in QUESTIONS:
+            chat.send_message(question)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "round_trips": len(chat.requests),
+        "prompt_tokens": sum(app.count_batch(chat.requests)),
+        "time_s": elapsed,
+    }
+
+
+def session_setup(sessions: int, shared: bool, tokenizer_model: str) -> float:
+    """Seconds to start sessions with one shared builder, or a new model and prompt count per session"""
+    start = time.perf_counter()
+    with redirect_stdout(sys.stderr):
+        builder = SessionBuilder(SYSTEM_PROMPT, tokenizer_model=tokenizer_model, model_class=FakeGenerativeModel)
+        for _ in range(sessions):
+            if not shared:
+                builder = SessionBuilder(SYSTEM_PROMPT, tokenizer_model=tokenizer_model,
+                                         model_class=FakeGenerativeModel)
+            builder.start()
+    return time.perf_counter() - start
+
+
+def report(title: str, results) -> None:
+    print(f"\n--- {title} ---")
+    for result in results:
+        print(f"{result['mode']:<12} {result['round_trips']} round trips  "
+              f"{result['prompt_tokens']:,} prompt tokens  {result['time_s']:.3f}s")
+
+    message, instruction = results
+    print(f"Round trips saved: {message['round_trips'] - instruction['round_trips']}  "
+          f"Prompt tokens saved: {message['prompt_tokens'] - instruction['prompt_tokens']:,} "
+          f"({1 - instruction['prompt_tokens'] / message['prompt_tokens']:.0%})  "
+          f"Speedup: {message['time_s'] / instruction['time_s']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark system prompts as messages vs system instructions")
+    parser.add_argument("--model", "-m", type=str, default="gpt-3.5-turbo",
+                        help="Model whose tokenizer counts the prompt tokens")
+    parser.add_argument("--thinks", type=int, default=5,
+                        help="Number of think steps in the scripted chain")
+    parser.add_argument("--delay", type=float, default=0.01,
+                        help="Fake model latency per streamed chunk in seconds")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Fake model latency per round trip before the first chunk in seconds")
+    parser.add_argument("--sessions", type=int, default=20,
+                        help="Sessions started for the setup comparison")
+    args = parser.parse_args()
+
+    app = TokenizerApp()
+    with redirect_stdout(sys.stderr):
+        app.load_tokenizer(args.model)
+
+    modes = ("message", "instruction")
+    report(f"Reasoning session ({args.thinks} think steps, {args.latency * 1000:.0f}ms per round trip)",
+           [reasoning_session(app, mode, args.thinks, args.delay, args.latency) for mode in modes])
+    report(f"Prefixed prompts ({len(QUESTIONS)} questions in one session)",
+           [prefixed_chat(app, mode, args.latency) for mode in modes])
+
+    per_session = session_setup(args.sessions, False, args.model)
+    shared = session_setup(args.sessions, True, args.model)
+    print(f"\n--- Session setup ({args.sessions} sessions) ---")
+    print(f"new model per session  {per_session:.3f}s")
+    print(f"shared builder         {shared:.3f}s  ({per_session / shared:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
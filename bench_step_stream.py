@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Step parser microbenchmarks - compares the old line-by-line try_parse_json with the
+streaming JSON object extractor on large, noisy model outputs
+"""
+
+
+import argparse
+import json
+import random
+import time
+from typing import Callable, List, Optional
+
+from step_stream import JSONObjectStream, extract_json_objects
+
+
+SIZES = {"small": 10_000, "medium": 1_000_000, "large": 10_000_000}
+
+NOISE = [
+    "Sure! Here is the next step:",
+    "```json",
+    "```",
+    "Let me think about this {carefully} before answering.",
+    '{"step": "think", "content": "truncated',
+    "    - a bullet with a } stray brace",
+]
+
+
+def try_parse_json(text):
+    """The per-script parser this replaces, kept as the baseline"""
+    if text.startswith("```"):
+        lines = text.strip().splitlines()
+        text = "\n".join(line for line in lines if not line.startswith("```"))
+
+    try:
+        return json.loads(text.strip())
+    except json.JSONDecodeError:
+        for line in text.splitlines():
+            try:
+                return json.loads(line.strip())
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+def make_output(chars: int, seed: int = 0, indent: Optional[int] = None) -> str:
+    """Build a reproducible model response of step objects mixed with prose, fences and broken JSON"""
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < chars:
+        if rng.random() < 0.4:
+            line = rng.choice(NOISE)
+        elif rng.random() < 0.2:
+            call = {"function": "get_weather", "input": rng.choice(["paris", "tokyo"])}
+            line = json.dumps({"step": "action", "calls": [call]}, indent=indent)
+        else:
+            line = json.dumps({"step": rng.choice(["analyse", "think", "validate"]),
+                               "content": "Considering {braces}, \"quotes\" and \\ escapes " * rng.randint(1, 8)},
+                              indent=indent)
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+def first_object(text: str) -> List:
+    parsed = try_parse_json(text)
+    return [] if parsed is None else [parsed]
+
+
+def stream_parse(text: str, chunk_size: int) -> List:
+    stream = JSONObjectStream()
+    objects = []
+    for i in range(0, len(text), chunk_size):
+        objects.extend(stream.feed(text[i:i + chunk_size]))
+    return objects + stream.close()
+
+
+def bench(fn: Callable, text: str, repeat: int) -> float:
+    """Best of repeat runs in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the step parser on noisy model outputs")
+    parser.add_argument("--sizes", nargs="*", default=list(SIZES), choices=list(SIZES),
+                        help="Output sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    parsers = [
+        ("try_parse_json", first_object),
+        ("extract_json_objects", extract_json_objects),
+        ("stream, 16-char chunks", lambda text: stream_parse(text, 16)),
+        ("stream, 1 KB chunks", lambda text: stream_parse(text, 1024)),
+    ]
+
+    for size in args.sizes:
+        # One object per line, then pretty-printed objects spanning several lines
+        for layout, indent in (("compact", None), ("pretty", 2)):
+            text = make_output(SIZES[size], indent=indent)
+            print(f"\n--- {size}, {layout}: {len(text):,} chars ---")
+            for name, fn in parsers:
+                elapsed = bench(fn, text, args.repeat)
+                print(f"{name:<24} {elapsed:.4f}s  ({len(text) / elapsed / 1e6:,.1f} MB/s)  "
+                      f"{len(fn(text)):,} objects found")
+
+
+if __name__ == "__main__":
+    main()
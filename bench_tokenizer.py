@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Tokenizer benchmark - compares per-string tokenization with the batch API,
+measures CLI cold-start time, and runs a cross-backend suite with JSON output
+"""
+
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional
+
+from tokenizer import TokenizerApp
+from tokenizer_registry import current_rss
+
+
+WORDS = [
+    "the", "model", "token", "prompt", "budget", "system", "user", "assistant",
+    "weather", "city", "json", "step", "result", "analyse", "validate", "cost",
+    "encoding", "corpus", "document", "batch", "café", "naïve", "数据", "🙂",
+]
+
+
+def make_texts(count: int, words_per_text: int, seed: int = 0) -> List[str]:
+    """Build a reproducible list of synthetic prompts"""
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_text)) for _ in range(count)]
+
+
+# One model per backend: tiktoken, Anthropic, transformers
+SUITE_MODELS = ["gpt-3.5-turbo", "claude-3-haiku", "llama-3"]
+
+# Text sizes in characters, from short prompts to multi-MB documents
+SUITE_SIZES = {
+    "prompt": 200,
+    "page": 4_000,
+    "document": 200_000,
+    "large": 4_000_000,
+}
+
+
+def make_document(chars: int, seed: int = 0) -> str:
+    """Build a reproducible text of roughly the given length"""
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+        if rng.random() < 0.05:
+            words.append("\n")
+    return " ".join(words)[:chars]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Per-call latency percentiles in milliseconds"""
+    if len(latencies) < 2:
+        value = latencies[0] * 1000 if latencies else 0.0
+        return {"p50_ms": value, "p90_ms": value, "p99_ms": value}
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"p50_ms": cuts[49] * 1000, "p90_ms": cuts[89] * 1000, "p99_ms": cuts[98] * 1000}
+
+
+def run_suite_for_model(model: str, bundle_dir: Optional[str], batch_count: int, threads: int) -> Dict:
+    """Benchmark one model in the current process; meant to run in a fresh interpreter"""
+    app = TokenizerApp(bundle_dir=bundle_dir)
+
+    rss_before = current_rss()
+    start = time.perf_counter()
+    with redirect_stdout(sys.stderr):
+        app.load_tokenizer(model)
+    load_time = time.perf_counter() - start
+    rss_after = current_rss()
+
+    result = {
+        "model": model,
+        "backend": app._get_tokenizer_type(model),
+        "load_time_s": load_time,
+        "load_rss_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "single": {},
+    }
+
+    for size_name, chars in SUITE_SIZES.items():
+        text = make_document(chars)
+        calls = max(3, min(200, 2_000_000 // chars))
+        latencies = []
+        token_count = 0
+        for _ in range(calls):
+            start = time.perf_counter()
+            _, token_count = app.tokenize_text(text)
+            latencies.append(time.perf_counter() - start)
+        result["single"][size_name] = {
+            "chars": len(text),
+            "tokens": token_count,
+            "calls": calls,
+            "tokens_per_s": token_count * calls / sum(latencies) if sum(latencies) else 0.0,
+            **latency_summary(latencies),
+        }
+
+    texts = make_texts(batch_count, 64)
+    batch_times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        _, counts = app.tokenize_batch(texts, num_threads=threads)
+        batch_times.append(time.perf_counter() - start)
+    count_times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        app.count_batch(texts, num_threads=threads)
+        count_times.append(time.perf_counter() - start)
+    total_tokens = sum(counts)
+    result["batch"] = {
+        "texts": batch_count,
+        "tokens": total_tokens,
+        "tokenize_batch_tokens_per_s": total_tokens / min(batch_times) if min(batch_times) else 0.0,
+        "count_batch_tokens_per_s": total_tokens / min(count_times) if min(count_times) else 0.0,
+    }
+
+    # ru_maxrss is reported in KiB on Linux
+    result["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return result
+
+
+def bench_suite(models: List[str], bundle_dir: Optional[str], batch_count: int, threads: int,
+                output: Optional[str]) -> Dict:
+    """Run the suite for each model in its own interpreter and collect JSON results"""
+    results = []
+    for model in models:
+        command = [sys.executable, os.path.abspath(__file__), "--suite-worker", model,
+                   "--count", str(batch_count), "--threads", str(threads)]
+        if bundle_dir:
+            command += ["--bundle", bundle_dir]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"Benchmark for {model} failed: {completed.stderr.strip().splitlines()[-1:]}", file=sys.stderr)
+            results.append({"model": model, "error": completed.stderr.strip()[-2000:]})
+            continue
+        results.append(json.loads(completed.stdout))
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    for result in results:
+        if "error" in result:
+            continue
+        print(f"{result['model']:<16} load {result['load_time_s']:.3f}s  "
+              f"peak RSS {result['peak_rss_bytes'] / (1 << 20):.0f} MiB  "
+              f"batch {result['batch']['tokenize_batch_tokens_per_s']:,.0f} tokens/s  "
+              f"large {result['single']['large']['tokens_per_s']:,.0f} tokens/s", file=sys.stderr)
+    return report
+
+
+def bench_loop(app: TokenizerApp, texts: List[str]) -> float:
+    """Time tokenizing each text with tokenize_text"""
+    start = time.perf_counter()
+    for text in texts:
+        app.tokenize_text(text)
+    return time.perf_counter() - start
+
+
+def bench_batch(app: TokenizerApp, texts: List[str], num_threads: int) -> float:
+    """Time tokenizing all texts with tokenize_batch"""
+    start = time.perf_counter()
+    app.tokenize_batch(texts, num_threads=num_threads)
+    return time.perf_counter() - start
+
+
+def bench_command(command: List[str], repeat: int) -> List[float]:
+    """Time a fresh interpreter running the given command"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_cold_start(model: str, repeat: int) -> None:
+    """Report how long the CLI takes to start for common invocations"""
+    commands = {
+        "import tokenizer": [sys.executable, "-c", "import tokenizer"],
+        "--list-models": [sys.executable, "tokenizer.py", "--list-models"],
+        f"--model {model} --text": [sys.executable, "tokenizer.py", "--model", model, "--text", "hello", "--count-only"],
+    }
+
+    print(f"\n--- Cold start ({repeat} runs each) ---")
+    for name, command in commands.items():
+        timings = bench_command(command, repeat)
+        print(f"{name:<32} min {min(timings):.3f}s  median {statistics.median(timings):.3f}s")
+
+    # Confirm that no heavy backend is pulled in at import time
+    probe = "import sys, tokenizer; print(sorted(m for m in ('tiktoken', 'transformers', 'torch', 'anthropic') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True)
+    print(f"Backends imported by 'import tokenizer': {result.stdout.strip() or result.stderr.strip()}")
+
+
+def main():
+    """Run the loop vs. batch benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark per-string vs. batch tokenization")
+    parser.add_argument("--model", "-m", type=str, default="gpt-3.5-turbo",
+                        help="Model whose tokenizer is benchmarked")
+    parser.add_argument("--count", "-n", type=int, default=10000,
+                        help="Number of texts to tokenize")
+    parser.add_argument("--words", "-w", type=int, default=64,
+                        help="Words per synthetic text")
+    parser.add_argument("--threads", type=int, default=8,
+                        help="Thread count for the batch path")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Repetitions; the best time is reported")
+    parser.add_argument("--cold-start", action="store_true",
+                        help="Measure CLI startup time instead of tokenization throughput")
+    parser.add_argument("--suite", action="store_true",
+                        help="Run the cross-backend suite and emit JSON results")
+    parser.add_argument("--models", nargs="*", default=SUITE_MODELS,
+                        help="Models covered by --suite")
+    parser.add_argument("--bundle", type=str, default=None, metavar="DIR",
+                        help="Offline tokenizer bundle (see 'tokenizer.py export-bundle')")
+    parser.add_argument("--output", "-o", type=str, default=None,
+                        help="Write --suite JSON results to this file instead of stdout")
+    parser.add_argument("--suite-worker", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_start:
+        bench_cold_start(args.model, args.repeat)
+        return
+
+    if args.suite_worker:
+        print(json.dumps(run_suite_for_model(args.suite_worker, args.bundle, args.count, args.threads)))
+        return
+
+    if args.suite:
+        bench_suite(args.models, args.bundle, args.count, args.threads, args.output)
+        return
+
+    app = TokenizerApp()
+    app.load_tokenizer(args.model)
+
+    texts = make_texts(args.count, args.words)
+    _, counts = app.tokenize_batch(texts, num_threads=args.threads)
+    total_tokens = sum(counts)
+
+    loop_time = min(bench_loop(app, texts) for _ in range(args.repeat))
+    batch_time = min(bench_batch(app, texts, args.threads) for _ in range(args.repeat))
+
+    print(f"\n--- Benchmark for {args.model} ({args.count} texts, {total_tokens} tokens) ---")
+    print(f"tokenize_text loop: {loop_time:.3f}s  ({total_tokens / loop_time:,.0f} tokens/s)")
+    print(f"tokenize_batch:     {batch_time:.3f}s  ({total_tokens / batch_time:,.0f} tokens/s)")
+    print(f"Speedup: {loop_time / batch_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Bulk prompt runner - runs a JSONL file of prompts concurrently under a concurrency limit and a
+tokens-per-minute budget, streaming results to JSONL in completion order with resumable checkpoints
+"""
+
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from history_budget import DEFAULT_TOKENIZER_MODEL
+from response_cache import DEFAULT_RESPONSE_CACHE_PATH, ResponseCache, response_key
+from tokenizer import TokenizerApp
+
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+def load_prompts(path: str) -> List[Dict]:
+    """Read prompt records
+
+    Each line is a JSON string (a zero-shot prompt, as in chat.py) or an
+    object with "prompt" (or "contents") and optional "id",
+    "system_instruction" (as in chat_2.py) and "model". Records without an
+    id get "line-<n>"; ids must be unique, since they are how a resumed run
+    matches results to records.
+    """
+    records = []
+    ids: Set[str] = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"prompt": record}
+            prompt = record.get("prompt", record.get("contents"))
+            if prompt is None:
+                raise ValueError(f"{path}:{line_number}: record has no 'prompt'")
+            record_id = str(record.get("id", f"line-{line_number}"))
+            if record_id in ids:
+                raise ValueError(f"{path}:{line_number}: duplicate id {record_id!r}")
+            ids.add(record_id)
+            records.append({
+                "id": record_id,
+                "prompt": prompt,
+                "system_instruction": record.get("system_instruction"),
+                "model": record.get("model"),
+            })
+    return records
+
+
+def load_checkpoint(output_path: str) -> Set[str]:
+    """IDs already answered in an existing output file
+
+    Failed records are not counted as done, so they are retried; their error
+    lines are dropped, along with a partial last line left by an interrupted
+    run, so the file keeps exactly one line per answered id.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, "rb") as f:
+        lines = f.read().split(b"\n")
+    partial = lines.pop()  # Empty when the file ends with a newline
+
+    kept = []
+    for line in lines:
+        try:
+            result = json.loads(line)
+        except ValueError:
+            kept.append(line)
+            continue
+        if isinstance(result, dict) and "error" in result:
+            continue
+        if isinstance(result, dict) and "id" in result:
+            done.add(str(result["id"]))
+        kept.append(line)
+
+    if partial or len(kept) < len(lines):
+        temp_path = output_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.writelines(line + b"\n" for line in kept)
+        os.replace(temp_path, output_path)
+    return done
+
+
+class TokenBucket:
+    """Tokens-per-minute limiter: each request waits until its estimated tokens fit in the budget"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()  # Requests are admitted in arrival order
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: int) -> None:
+        amount = min(amount, self.capacity)  # An oversized request would otherwise wait forever
+        async with self.lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def adjust(self, delta: float) -> None:
+        """Correct the budget once actual usage is known (positive delta returns tokens)"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class BulkRunner:
+    """Runs prompt records with a fixed pool of async workers sharing a token bucket"""
+
+    def __init__(self, client, app: TokenizerApp, model: str = DEFAULT_MODEL, concurrency: int = 16,
+                 tokens_per_minute: Optional[int] = None, output_tokens: int = 256, retries: int = 3,
+                 cache: Optional[ResponseCache] = None):
+        self.client = client
+        self.app = app
+        self.model = model
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.output_tokens = output_tokens
+        self.retries = retries
+        self.cache = cache
+        self.completed = 0
+        self.failed = 0
+        self.cached = 0
+        self.tokens_used = 0
+
+    def estimate(self, records: List[Dict]) -> List[int]:
+        """Pre-flight token estimates: prompt plus system instruction, plus the expected output"""
+        texts = [
+            "\n".join(text if isinstance(text, str) else json.dumps(text)
+                      for text in (record["system_instruction"], record["prompt"]) if text)
+            for record in records
+        ]
+        return [count + self.output_tokens for count in self.app.count_batch(texts)]
+
+    async def run_one(self, record: Dict, estimate: int) -> Dict:
+        from google.genai import errors, types
+
+        model = record["model"] or self.model
+        result = {"id": record["id"], "model": model, "estimated_tokens": estimate}
+
+        config = None
+        if record["system_instruction"]:
+            config = types.GenerateContentConfig(system_instruction=record["system_instruction"])
+
+        key = None
+        if self.cache is not None:
+            key = response_key(model, record["system_instruction"], record["prompt"], {"config": config})
+            text = self.cache.get(key)
+            if text is not None:
+                self.cached += 1
+                return {**result, "response": text, "cached": True}
+
+        if self.bucket is not None:
+            await self.bucket.acquire(estimate)
+
+        start = time.perf_counter()
+        for attempt in range(1, self.retries + 2):
+            try:
+                response = await self.client.aio.models.generate_content(
+                    model=model, contents=record["prompt"], config=config
+                )
+                break
+            except errors.APIError as e:
+                retryable = e.code in RETRYABLE_CODES
+                error = f"{e.code} {e.message}"
+            except Exception as e:  # Connection errors and timeouts
+                retryable = True
+                error = f"{type(e).__name__}: {e}"
+            if not retryable or attempt > self.retries:
+                self.failed += 1
+                return {**result, "error": error, "attempts": attempt}
+            await asyncio.sleep(0.5 * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+        usage = response.usage_metadata
+        used = usage.total_token_count if usage is not None and usage.total_token_count else estimate
+        if self.bucket is not None:
+            self.bucket.adjust(estimate - used)
+        self.tokens_used += used
+        self.completed += 1
+
+        if key is not None and response.text is not None:
+            self.cache.put(key, response.text)
+
+        return {
+            **result,
+            "response": response.text,
+            "prompt_tokens": usage.prompt_token_count if usage is not None else None,
+            "output_tokens": usage.candidates_token_count if usage is not None else None,
+            "latency_s": round(time.perf_counter() - start, 4),
+            "attempts": attempt,
+        }
+
+    async def run(self, records: List[Dict], output_path: str) -> None:
+        """Run every record, appending each result to output_path as soon as it completes"""
+        estimates = self.estimate(records)
+        if len(estimates) != len(records):
+            print("Error: Could not estimate token counts for the prompts; no requests were sent")
+            sys.exit(1)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in zip(records, estimates):
+            queue.put_nowait(item)
+        total = len(records)
+        start = time.perf_counter()
+
+        with open(output_path, "a", encoding="utf-8") as out:
+            async def worker():
+                while True:
+                    try:
+                        record, estimate = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    result = await self.run_one(record, estimate)
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()  # Every written line is a checkpoint
+                    finished = self.completed + self.failed + self.cached
+                    print(f"\rProgress: {finished}/{total}", end="", file=sys.stderr, flush=True)
+
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, total) or 1)))
+
+        elapsed = time.perf_counter() - start
+        print(file=sys.stderr)
+        print(f"Completed {self.completed}, cached {self.cached}, failed {self.failed} in {elapsed:.2f}s "
+              f"({total / elapsed if elapsed else 0:.1f} prompts/s, "
+              f"{self.tokens_used / elapsed * 60 if elapsed else 0:,.0f} tokens/min)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts against Gemini concurrently")
+    parser.add_argument("input", type=str, help="JSONL file of prompts")
+    parser.add_argument("--output", "-o", type=str, required=True,
+                        help="JSONL file for results; an existing file is resumed")
+    parser.add_argument("--model", "-m", type=str, default=DEFAULT_MODEL,
+                        help="Model for records that don't name one")
+    parser.add_argument("--concurrency", "-j", type=int, default=16,
+                        help="Requests in flight at once")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="Token-per-minute budget across all requests")
+    parser.add_argument("--output-tokens", type=int, default=256,
+                        help="Expected output tokens per request, added to pre-flight estimates")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="Retries for rate-limited or failed requests")
+    parser.add_argument("--tokenizer", type=str, default=DEFAULT_TOKENIZER_MODEL,
+                        help="Supported model whose tokenizer estimates prompt tokens")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_RESPONSE_CACHE_PATH, default=None, metavar="PATH",
+                        help="Answer repeated prompts from the response cache (default path: %(const)s)")
+    parser.add_argument("--base-url", type=str, default=os.getenv("GEMINI_BASE_URL"),
+                        help="API base URL, e.g. a local stub_model_server.py for load tests")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from google import genai
+    from google.genai import types
+
+    try:
+        records = load_prompts(args.input)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    done = load_checkpoint(args.output)
+    pending = [record for record in records if record["id"] not in done]
+    if done:
+        print(f"Resuming: {len(records) - len(pending)} of {len(records)} prompts already answered", file=sys.stderr)
+    if not pending:
+        return
+
+    app = TokenizerApp()
+    with redirect_stdout(sys.stderr):
+        app.load_tokenizer(args.tokenizer)
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key and not args.base_url:
+        print("Error: GOOGLE_API_KEY is not set")
+        sys.exit(1)
+    http_options = types.HttpOptions(base_url=args.base_url) if args.base_url else None
+    client = genai.Client(api_key=api_key or "stub", http_options=http_options)
+    cache = ResponseCache(args.cache) if args.cache else None
+
+    runner = BulkRunner(client, app, model=args.model, concurrency=args.concurrency, tokens_per_minute=args.tpm,
+                        output_tokens=args.output_tokens, retries=args.retries, cache=cache)
+    try:
+        asyncio.run(runner.run(pending, args.output))
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume", file=sys.stderr)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,26 @@
 from dotenv import load_dotenv
 from google import genai
 import os
+from response_cache import CachedModels, ResponseCache
 
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
 
-client = genai.Client(api_key=api_key)
+if os.getenv("FAKE_MODEL"):
+    from fake_model import FakeClient as Client
+else:
+    Client = genai.Client
 
-response = client.models.generate_content( # This is zero-short prompting, where the model is given a direct question or task without the prior examples
+client = Client(api_key=api_key)
+
+# Identical prompts are answered from the local response cache instead of the API
+cache = ResponseCache()
+models = CachedModels(client.models, cache)
+
+response = models.generate_content( # This is zero-short prompting, where the model is given a direct question or task without the prior examples
     model = "gemini-2.0-flash",
     contents = "Explain how AI works?",
 )
 
-print(response.text)
\ No newline at end of file
+print(response.text)
+cache.close()
\ No newline at end of file
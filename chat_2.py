@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
+from response_cache import CachedChat, ResponseCache
+from session_builder import SessionBuilder
 
 # Load API key
 load_dotenv()
@@ -23,13 +25,16 @@ Input: Why is sky blue?
 Output: Bruh? You alright? Is it a maths query?
 """
 
-chat = genai.GenerativeModel("gemini-2.0-flash").start_chat()
+# Repeated questions in the same conversation are answered from the cache
+cache = ResponseCache()
+# The instruction is set once on the model instead of being prefixed to every message
+builder = SessionBuilder(system_instruction, budget=0)
+chat = CachedChat(builder.start(), cache, builder.model_name, system_instruction)
 
 user_input = "what is a mobile phone?"
 
-full_prompt = f"{system_instruction}\n\nUser: {user_input}"
-
-response = chat.send_message(full_prompt)
+response = chat.send_message(user_input)
 
 # Output response
 print(response.text)
+cache.close()
@@ -1,7 +1,8 @@
 import os
-import json
 from dotenv import load_dotenv
 import google.generativeai as genai
+from reasoning import ReasoningRunner
+from session_builder import SessionBuilder
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
@@ -17,10 +18,11 @@ For a given user input, follow these steps in order:
 5. "result"
 
 Rules:
-- Output a single JSON object at each step in the format:
+- Reply with every step in one response, from "analyse" through "result": a separate JSON object
+  for each step, one per line, in the format:
   { "step": "string", "content": "string" }
 - Think 5-6 times before giving the final output.
-- Wait for next input to proceed to the next step.
+- If a message asks for the next step instead, reply with only that step's JSON object.
 - Be extremely careful when analyzing mathematical or logical queries.
 
 Example Input: What is 2 + 2
@@ -31,40 +33,19 @@ Example Output:
 { "step": "validate", "content": "Double-checking: 2 + 2 equals 4, so the output is correct." }
 { "step": "result", "content": "2 + 2 = 4, calculated by adding the operands." }
 
-Respond one step at a time.
+Respond with all steps in one reply.
 """
 
-chat = genai.GenerativeModel("gemini-2.0-flash").start_chat()
-chat.send_message(system_prompt)
+# The system prompt is the model's system instruction, so the session starts without a round trip
+chat = SessionBuilder(system_prompt).start()
 
 query = input(" ->> ")
-chat.send_message(f"User Input: {query}")
 
-def try_parse_json(text):
-    # Remove markdown-style code block (```json ... ```)
-    if text.startswith("```"):
-        lines = text.strip().splitlines()
-        # Remove first and last line (which are ```json and ```)
-        text = "\n".join(line for line in lines if not line.startswith("```"))
-
-    try:
-        return json.loads(text.strip())
-    except json.JSONDecodeError:
-        for line in text.splitlines():
-            try:
-                return json.loads(line.strip())
-            except json.JSONDecodeError:
-                continue
-    return None
-
-while True:
-    response = chat.send_message("Next step, please respond in JSON")
-    parsed = try_parse_json(response.text)
-
-    if not parsed:
-        print("❌ Could not parse valid JSON. Response was:\n", response.text)
-        break
+# Every step is requested in one reply; the runner falls back to "Next step" requests if it doesn't validate
+runner = ReasoningRunner(chat, stepwise_prompt="Next step, please respond in JSON")
+parsed = None
 
+for parsed in runner.steps(query):
     step = parsed.get("step")
     content = parsed.get("content")
 
@@ -77,3 +58,6 @@ while True:
     else:
         print(f"✅ FINAL RESULT: {content}")
         break
+
+if not parsed or runner.unparsed:
+    print("❌ Could not parse valid JSON. Response was:\n", runner.last_text)
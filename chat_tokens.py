@@ -0,0 +1,46 @@
+"""
+Chat token accounting - running token totals for conversations that grow one turn at a time
+"""
+
+
+from typing import Dict, List, Optional
+
+
+class ConversationTokenCounter:
+    """Keeps a running token total for a conversation
+
+    Each appended message is counted once through TokenizerApp.count_message,
+    so adding a turn costs O(size of the new message) regardless of how long
+    the history already is.
+    """
+
+    def __init__(self, app, messages: Optional[List[Dict[str, str]]] = None):
+        self.app = app
+        self.message_tokens: List[int] = []
+        self.content_tokens = 0
+        for message in messages or []:
+            self.append(message)
+
+    def append(self, message: Dict[str, str]) -> int:
+        """Add a message and return its token count"""
+        token_count = self.app.count_message(message)
+        self.message_tokens.append(token_count)
+        self.content_tokens += token_count
+        return token_count
+
+    def pop(self, index: int = -1) -> int:
+        """Remove a message (e.g. when compacting history) and return its token count"""
+        token_count = self.message_tokens.pop(index)
+        self.content_tokens -= token_count
+        return token_count
+
+    @property
+    def total(self) -> int:
+        """Tokens for the whole conversation, including reply priming"""
+        if not self.message_tokens:
+            return 0
+        model_family = self.app._get_model_family()
+        return self.content_tokens + self.app.CHAT_PRIMING_TOKENS.get(model_family, 0)
+
+    def __len__(self) -> int:
+        return len(self.message_tokens)
@@ -0,0 +1,136 @@
+"""
+Cost estimator - prices batches of token counts for every supported model with NumPy
+"""
+
+
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Sequence
+
+
+# USD per 1K tokens. Hugging Face models are priced at typical hosted-inference rates.
+PRICING = {
+    # OpenAI models
+    "gpt-3.5-turbo": {"input": 0.0005, "output": 0.0015},
+    "gpt-4": {"input": 0.01, "output": 0.03},
+    "gpt-4-turbo": {"input": 0.01, "output": 0.03},
+
+    # Anthropic models
+    "claude-3-opus": {"input": 0.015, "output": 0.075},
+    "claude-3-sonnet": {"input": 0.003, "output": 0.015},
+    "claude-3-haiku": {"input": 0.00025, "output": 0.00125},
+
+    # Hugging Face models
+    "llama-3": {"input": 0.0002, "output": 0.0002},
+    "mistral": {"input": 0.00025, "output": 0.00025},
+    "grok-1": {"input": 0.005, "output": 0.015},
+}
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+class CostEstimator:
+    """Vectorized cost estimation over arrays of per-request token counts"""
+
+    def __init__(self, app, pricing: Optional[Dict[str, Dict[str, float]]] = None):
+        self.app = app
+        self.pricing = pricing or PRICING
+
+    def role_overhead(self, model: str, role: str = "user") -> int:
+        """Formatting tokens added to each request for the role, from ROLE_TOKENS"""
+        model_family = self.app._get_model_family(model)
+        return self.app.ROLE_TOKENS.get(model_family, {}).get(role, 0)
+
+    def estimate(self, model: str, input_tokens: Sequence[int], output_tokens: Optional[Sequence[int]] = None,
+                 role: str = "user"):
+        """Return per-request costs in USD as a float64 array"""
+        import numpy as np
+
+        if model not in self.pricing:
+            raise ValueError(f"No pricing for model '{model}'")
+
+        price = self.pricing[model]
+        inputs = np.asarray(input_tokens, dtype=np.float64) + self.role_overhead(model, role)
+        costs = inputs * (price["input"] / 1000)
+        if output_tokens is not None:
+            costs += np.asarray(output_tokens, dtype=np.float64) * (price["output"] / 1000)
+        return costs
+
+    def summarize(self, requests: Dict[str, Dict[str, Sequence[int]]], role: str = "user",
+                  percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict:
+        """Aggregate costs per model and overall
+
+        requests maps model -> {"input": counts, "output": counts (optional)}.
+        """
+        import numpy as np
+
+        per_model = {}
+        all_costs = []
+
+        for model, counts in requests.items():
+            costs = self.estimate(model, counts["input"], counts.get("output"), role=role)
+            all_costs.append(costs)
+            per_model[model] = self._aggregate(costs, percentiles)
+            per_model[model]["input_tokens"] = int(np.sum(counts["input"]))
+            per_model[model]["output_tokens"] = int(np.sum(counts["output"])) if counts.get("output") is not None else 0
+
+        total = self._aggregate(np.concatenate(all_costs) if all_costs else np.empty(0), percentiles)
+        return {"models": per_model, "total": total}
+
+    def _aggregate(self, costs, percentiles: Sequence[float]) -> Dict:
+        """Sum, mean and percentiles of a cost array"""
+        import numpy as np
+
+        summary = {
+            "requests": int(costs.size),
+            "total_cost": float(costs.sum()),
+            "mean_cost": float(costs.mean()) if costs.size else 0.0,
+        }
+        if costs.size:
+            for p, value in zip(percentiles, np.percentile(costs, percentiles)):
+                summary[f"p{p:g}_cost"] = float(value)
+        return summary
+
+
+def _token_field(record: Dict, field: str, line_number: int) -> float:
+    """A token count from a usage record; missing or null counts are 0"""
+    value = record.get(field)
+    if value is None:
+        return 0
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"line {line_number}: '{field}' must be a number, got {json.dumps(value)}")
+    return value
+
+
+def load_requests(lines: Iterable[str]) -> Dict[str, Dict[str, list]]:
+    """Group JSONL usage records ({"model", "input_tokens", "output_tokens"}) by model"""
+    grouped = defaultdict(lambda: {"input": [], "output": []})
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"line {line_number}: invalid JSON ({e})")
+        if not isinstance(record, dict) or not isinstance(record.get("model"), str):
+            raise ValueError(f"line {line_number}: expected an object with a 'model' name")
+        counts = grouped[record["model"]]
+        counts["input"].append(_token_field(record, "input_tokens", line_number))
+        counts["output"].append(_token_field(record, "output_tokens", line_number))
+    return dict(grouped)
+
+
+def display_cost_summary(summary: Dict) -> None:
+    """Print a per-model and overall cost report"""
+    print("\n--- Cost Estimate ---")
+    for model, entry in sorted(summary["models"].items()):
+        print(f"{model}: {entry['requests']:,} requests, {entry['input_tokens']:,} input / "
+              f"{entry['output_tokens']:,} output tokens, ${entry['total_cost']:.4f} USD")
+
+    total = summary["total"]
+    print(f"Total: {total['requests']:,} requests, ${total['total_cost']:.4f} USD "
+          f"(mean ${total['mean_cost']:.6f} per request)")
+    percentiles = [f"{key[:-5]} ${value:.6f}" for key, value in total.items() if key.endswith("_cost") and key.startswith("p")]
+    if percentiles:
+        print(f"Per-request cost percentiles: {', '.join(percentiles)}")
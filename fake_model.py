@@ -0,0 +1,180 @@
+"""
+Fake model - a local stand-in for Gemini chat sessions that streams scripted replies in chunks,
+and for the google.genai client
+
+Set FAKE_MODEL=1 to run the scripts against the built-in script, or
+FAKE_MODEL=<path> to a file with one reply per line.
+"""
+
+
+import asyncio
+import os
+import time
+from typing import List, Optional
+
+
+DEFAULT_REPLIES = [
+    '```json\n{ "step": "analyse", "content": "The user is asking a basic arithmetic operation involving addition." }\n```',
+    '{ "step": "think", "content": "To solve this, I should add 2 and 2." }',
+    '{ "step": "output", "content": "4" }',
+    '{ "step": "validate", "content": "Double-checking: 2 + 2 equals 4, so the output is correct." }',
+    '{ "step": "result", "content": "2 + 2 = 4, calculated by adding the operands." }',
+]
+
+CHUNK_SIZE = 16  # Characters per streamed chunk
+CHUNK_DELAY = float(os.getenv("FAKE_MODEL_DELAY", "0.02"))  # Seconds to "generate" each chunk
+LATENCY = float(os.getenv("FAKE_MODEL_LATENCY", "0.2"))  # Seconds per round trip before the first chunk
+
+# Instructions the fake understands for how to answer a query
+ONE_STEP_INSTRUCTIONS = ("one step at a time", "wait for the next prompt")
+ALL_STEPS_INSTRUCTIONS = ("all steps", "every step")
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeResponse:
+    """Mimics a genai response: iterate (or async-iterate) for chunks, or read .text to wait for all of it"""
+
+    def __init__(self, text: str, delay: float, latency: float):
+        self.full_text = text
+        self.delay = delay
+        self.latency = latency
+        self.chunks = [text[i:i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE)] or [""]
+
+    def __iter__(self):
+        time.sleep(self.latency)
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield FakeChunk(chunk)
+
+    async def __aiter__(self):
+        await asyncio.sleep(self.latency)
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield FakeChunk(chunk)
+
+    @property
+    def text(self) -> str:
+        return self.full_text
+
+
+class FakePart:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeContent:
+    """Mimics a genai history entry (protos.Content)"""
+
+    def __init__(self, role: str, text: str):
+        self.role = role
+        self.parts = [FakePart(text)]
+
+
+class FakeChat:
+    """Answers a query the way its instructions ask, and each "Next step" message with the next scripted reply
+
+    A "User Input:" query gets every remaining reply at once when the
+    instructions ask for all steps in one reply, and is acknowledged when they
+    ask for one step at a time. Instructions in the message override the
+    system instruction; anything else is acknowledged. Like a real chat
+    session, each request carries the system instruction and the whole
+    history, which are kept in requests so callers can measure how much was sent.
+    """
+
+    def __init__(self, replies: List[str], delay: float, latency: float, system_instruction: Optional[str] = None):
+        self.replies = list(replies)
+        self.system_instruction = system_instruction
+        self.delay = delay
+        self.latency = latency
+        self._history: List[FakeContent] = []
+        self.requests: List[str] = []  # Full prompt (system instruction + history + message) of every round trip
+
+    @property
+    def history(self) -> List[FakeContent]:
+        return self._history
+
+    @history.setter
+    def history(self, history) -> None:
+        # Accepts {"role", "parts"} dicts like ChatSession.history does
+        self._history = [
+            entry if isinstance(entry, FakeContent) else FakeContent(entry["role"], "".join(entry["parts"]))
+            for entry in history
+        ]
+
+    def _reply(self, content: str) -> str:
+        prefix = [self.system_instruction] if self.system_instruction else []
+        self.requests.append("\n".join(prefix + [entry.parts[0].text for entry in self._history] + [content]))
+        if content.startswith("Next step") and self.replies:
+            reply = self.replies.pop(0)
+        elif content.startswith("User Input:") and self.replies and self._answers_all_steps(content):
+            reply = "\n".join(self.replies)
+            self.replies = []
+        else:
+            reply = "OK"
+        self._history += [FakeContent("user", content), FakeContent("model", reply)]
+        return reply
+
+    def _answers_all_steps(self, content: str) -> bool:
+        """Whether the message, or failing that the system instruction, asks for every step in one reply"""
+        for instructions in (content, self.system_instruction or ""):
+            instructions = instructions.lower()
+            if any(phrase in instructions for phrase in ONE_STEP_INSTRUCTIONS):
+                return False
+            if any(phrase in instructions for phrase in ALL_STEPS_INSTRUCTIONS):
+                return True
+        return False
+
+    def send_message(self, content: str, stream: bool = False, generation_config=None) -> FakeResponse:
+        response = FakeResponse(self._reply(content), self.delay, self.latency)
+        if not stream:
+            time.sleep(self.latency + self.delay * len(response.chunks))  # Blocking calls wait for the whole reply
+        return response
+
+    async def send_message_async(self, content: str, stream: bool = False, generation_config=None) -> FakeResponse:
+        response = FakeResponse(self._reply(content), self.delay, self.latency)
+        if not stream:
+            await asyncio.sleep(self.latency + self.delay * len(response.chunks))
+        return response
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name: str = "fake", replies: Optional[List[str]] = None, delay: float = CHUNK_DELAY,
+                 latency: float = LATENCY, system_instruction: Optional[str] = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.replies = replies if replies is not None else load_replies(os.getenv("FAKE_MODEL"))
+        self.delay = delay
+        self.latency = latency
+
+    def start_chat(self) -> FakeChat:
+        return FakeChat(self.replies, self.delay, self.latency, self.system_instruction)
+
+
+class FakeModels:
+    """Mimics google.genai client.models; every call waits for the round-trip latency"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, model: str, contents, config=None) -> FakeResponse:
+        self.calls += 1
+        time.sleep(self.latency)
+        return FakeResponse(f"[{model}] Fake answer to: {contents}", 0.0, 0.0)
+
+
+class FakeClient:
+    def __init__(self, api_key: Optional[str] = None, latency: float = LATENCY):
+        self.models = FakeModels(latency)
+
+
+def load_replies(source: Optional[str]) -> List[str]:
+    """Scripted replies from a file (one per line), or the default arithmetic walkthrough"""
+    if source and os.path.isfile(source):
+        with open(source, "r", encoding="utf-8") as f:
+            return [line.rstrip("\n") for line in f if line.strip()]
+    return DEFAULT_REPLIES
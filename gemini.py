@@ -1,7 +1,8 @@
 import os
-import json
 from dotenv import load_dotenv
 import google.generativeai as genai
+from reasoning import ReasoningRunner
+from session_builder import SessionBuilder
 
 # Load environment variables
 load_dotenv()
@@ -19,10 +20,11 @@ For a given user input, follow these steps in order:
 5. "result"
 
 Rules:
-- Output a single JSON object at each step:
+- Reply with every step in one response, from "analyse" through "result": a separate JSON object
+  for each step, one per line, in the format:
   { "step": "string", "content": "string" }
 - Think 5-6 times before giving the final output.
-- Wait for the next prompt before continuing to the next step.
+- If a message asks for the next step instead, reply with only that step's JSON object.
 - Be very careful with mathematical/logical problems.
 
 Example Input: What is 2 + 2
@@ -33,44 +35,20 @@ Example Output:
 { "step": "validate", "content": "Double-checking: 2 + 2 equals 4, so the output is correct." }
 { "step": "result", "content": "2 + 2 = 4, calculated by adding the operands." }
 
-Respond one step at a time.
+Respond with all steps in one reply.
 """
 
-# Helper to clean and parse JSON from model output
-def try_parse_json(text):
-    # Strip markdown code block syntax if present
-    if text.startswith("```"):
-        lines = text.strip().splitlines()
-        text = "\n".join(line for line in lines if not line.startswith("```"))
-
-    try:
-        return json.loads(text.strip())
-    except json.JSONDecodeError:
-        # Try parsing each line individually if multi-line JSON blocks exist
-        for line in text.splitlines():
-            try:
-                return json.loads(line.strip())
-            except json.JSONDecodeError:
-                continue
-    return None
-
-# Start chat
-chat = genai.GenerativeModel("gemini-2.0-flash").start_chat()
-chat.send_message(SYSTEM_PROMPT)
+# Start chat; the system prompt is the model's system instruction, so no round trip is spent sending it
+chat = SessionBuilder(SYSTEM_PROMPT).start()
 
 # Get user query
 query = input("🧑 Your Question: ")
-chat.send_message(f"User Input: {query}")
 
-# Step-by-step conversation loop
-while True:
-    response = chat.send_message("Next step, please respond in JSON format only.")
-    parsed = try_parse_json(response.text)
-
-    if not parsed:
-        print("❌ Could not parse valid JSON. Full response:\n", response.text)
-        break
+# All steps are requested in one reply, falling back to one request per step if it doesn't validate
+runner = ReasoningRunner(chat, stepwise_prompt="Next step, please respond in JSON format only.")
+parsed = None
 
+for parsed in runner.steps(query):
     step = parsed.get("step")
     content = parsed.get("content")
 
@@ -83,3 +61,6 @@ while True:
         break
     else:
         print(f"🧠 {step.upper()}: {content}")
+
+if not parsed or runner.unparsed:
+    print("❌ Could not parse valid JSON. Full response:\n", runner.last_text)
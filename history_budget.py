@@ -0,0 +1,168 @@
+"""
+History budget - keeps a Gemini chat session's resent history under a token budget by compacting old turns
+"""
+
+
+import io
+import json
+import os
+from contextlib import redirect_stdout
+from typing import Dict, Optional
+
+from tokenizer import TokenizerApp
+
+
+# Tokens per request, counted with the project's tokenizer; 0 disables compaction
+DEFAULT_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "8000"))
+# Gemini's tokenizer isn't available locally, so a supported model's tokenizer approximates it
+DEFAULT_TOKENIZER_MODEL = os.getenv("HISTORY_TOKENIZER", "gpt-4")
+
+PINNED_TURNS = 2  # The system prompt and the model's reply to it, when sent as a message
+RECENT_TURNS = 8  # Most recent turns, kept verbatim unless dropping older turns is not enough
+SUMMARY_CHARS = 160  # Observation content kept in a compacted summary
+TRUNCATED = "… (truncated)"
+
+
+def _turn_text(entry) -> str:
+    return "".join(part.text for part in entry.parts)
+
+
+def summarize_observation(text: str) -> Optional[str]:
+    """Compact form of an observation turn, or None if the turn isn't one"""
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(parsed, dict) or parsed.get("step") != "observe":
+        return None
+
+    content = parsed.get("content")
+    if not isinstance(content, str):
+        content = json.dumps(content)
+    if len(content) <= SUMMARY_CHARS or content.endswith(TRUNCATED):
+        return None  # Already compact
+    return json.dumps({"step": "observe", "content": content[:SUMMARY_CHARS] + TRUNCATED})
+
+
+def load_budget_tokenizer(model: str = DEFAULT_TOKENIZER_MODEL) -> Optional[TokenizerApp]:
+    """Load the tokenizer used for budgeting, or None (with a warning) if it can't be loaded"""
+    app = TokenizerApp()
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            app.load_tokenizer(model)
+    except SystemExit:
+        # load_tokenizer exits on failure; the chat still works, just without compaction
+        print(f"⚠️ History compaction disabled: {output.getvalue().strip()}")
+        return None
+    return app
+
+
+class BudgetedChat:
+    """Wraps a chat session and compacts its history before each request that would exceed the budget
+
+    The system prompt turns are always kept. Older observations are
+    collapsed into short summaries first. If that is not enough, the oldest
+    user/model pairs are dropped, and then the most recent turns get the same
+    treatment until the request fits. Turn counts go
+    through TokenizerApp.count_message, which memoizes them, so checking
+    the budget on every request is cheap.
+
+    When the system prompt is a model-level system instruction, pass its
+    token count as system_tokens: it is counted against every request and
+    no history turns are pinned.
+    """
+
+    def __init__(self, chat, app: Optional[TokenizerApp] = None, budget: int = DEFAULT_BUDGET,
+                 model: str = DEFAULT_TOKENIZER_MODEL, system_tokens: Optional[int] = None):
+        self.chat = chat
+        self.budget = budget
+        self.system_tokens = system_tokens or 0
+        self.pinned_turns = PINNED_TURNS if system_tokens is None else 0
+        self.compactions = 0
+        self.last_request_tokens = 0
+        self.warned = False  # The budget can't fit even a fully compacted request
+
+        if app is None and budget:
+            app = load_budget_tokenizer(model)
+            if app is None:
+                self.budget = 0
+        self.app = app
+
+    def __getattr__(self, name):
+        return getattr(self.chat, name)
+
+    @property
+    def history(self):
+        return self.chat.history
+
+    @history.setter
+    def history(self, history) -> None:
+        # Wrappers such as CachedChat replace the history; it belongs to the wrapped session
+        self.chat.history = history
+
+    def _count(self, role: str, text: str) -> int:
+        return self.app.count_message({"role": role, "content": text})
+
+    def compact(self, message: str) -> int:
+        """Shrink the history so history plus message fits the budget; returns the request's token count"""
+        if not self.budget:
+            return 0
+
+        turns = [{"role": entry.role, "text": _turn_text(entry)} for entry in self.chat.history]
+        counts = [self._count(turn["role"], turn["text"]) for turn in turns]
+        total = self.system_tokens + sum(counts) + self._count("user", message)
+        if total <= self.budget:
+            self.last_request_tokens = total
+            return total
+
+        # Older turns go first; the recent turns are only shrunk if that isn't enough
+        middle_end = max(len(turns) - RECENT_TURNS, self.pinned_turns)
+        drop = self.pinned_turns
+        summarized = False
+        for end in (middle_end, len(turns)):
+            if total <= self.budget:
+                break
+            for i in range(drop, end):
+                summary = summarize_observation(turns[i]["text"]) if turns[i]["role"] == "user" else None
+                if summary is not None:
+                    turns[i]["text"] = summary
+                    new_count = self._count("user", summary)
+                    total += new_count - counts[i]
+                    counts[i] = new_count
+                    summarized = True
+
+            # Drop whole user/model pairs so the roles keep alternating
+            while total > self.budget and drop + 2 <= end:
+                total -= counts[drop] + counts[drop + 1]
+                drop += 2
+
+        if total > self.budget and not self.warned:
+            print(f"⚠️ History budget of {self.budget} tokens is too small: the system prompt and the message "
+                  f"alone need {total}")
+            self.warned = True
+
+        if summarized or drop > self.pinned_turns:
+            self.chat.history = [
+                {"role": turn["role"], "parts": [turn["text"]]}
+                for turn in turns[:self.pinned_turns] + turns[drop:]
+            ]
+            self.compactions += 1
+        self.last_request_tokens = total
+        return total
+
+    def send_message(self, content: str, **kwargs):
+        self.compact(content)
+        return self.chat.send_message(content, **kwargs)
+
+    async def send_message_async(self, content: str, **kwargs):
+        self.compact(content)
+        return await self.chat.send_message_async(content, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "budget": self.budget,
+            "compactions": self.compactions,
+            "last_request_tokens": self.last_request_tokens,
+            "history_turns": len(self.chat.history),
+        }
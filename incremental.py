@@ -0,0 +1,161 @@
+"""
+Incremental tokenization - keeps a running token count for a document under edits,
+re-encoding only the segments around each change
+"""
+
+
+from bisect import bisect_right
+from typing import List
+
+from tokenizer import find_safe_split
+
+
+SEGMENT_SIZE = 2048  # Target characters per independently tokenized segment
+
+
+def split_segments(text: str, target: int = SEGMENT_SIZE) -> List[str]:
+    """Split text into roughly target-sized pieces at tokenization-safe boundaries"""
+    segments = []
+    start = 0
+    while len(text) - start > target:
+        window = target
+        split = 0
+        while start + window < len(text):
+            split = find_safe_split(text[start:start + window + 1])
+            if split:
+                break
+            window *= 2  # No safe boundary yet; look further ahead
+        if not split:
+            break
+        segments.append(text[start:start + split])
+        start += split
+    if start < len(text):
+        segments.append(text[start:])
+    return segments
+
+
+def _common_prefix(a: str, b: str) -> int:
+    """Length of the common prefix, using C-level slice comparisons"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    """Length of the common suffix, at most limit characters"""
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class IncrementalTokenizer:
+    """Token count for an editable document that stays equal to a full re-encode
+
+    The document is kept as segments split at boundaries that BPE
+    pre-tokenization never merges across, so each segment can be counted on
+    its own. An edit re-counts only the segments it touches, plus the
+    neighbouring segments whose boundaries the edit may have moved.
+
+    That only holds for regex pre-tokenizers (see
+    TokenizerApp.supports_chunked_counting). For other tokenizers, e.g.
+    SentencePiece-style ones, the document is one segment and every edit
+    re-counts all of it.
+    """
+
+    def __init__(self, app, text: str = "", segment_size: int = SEGMENT_SIZE):
+        self.app = app
+        self.model = app.current_model  # Counts are only valid for this model's tokenizer
+        self.segment_size = segment_size if app.supports_chunked_counting() else None
+        self.text = ""
+        self.segments: List[str] = []
+        self.counts: List[int] = []
+        self.starts: List[int] = []
+        self.segment_tokens = 0
+        self.last_recounted = 0  # Segments re-encoded by the most recent change
+        self.set_text(text)
+
+    def _count_segments(self, segments: List[str]) -> List[int]:
+        """Count segments without per-segment special tokens"""
+        tokenizer = self.app.tokenizers[self.app.current_model]
+        tokenizer_type = self.app._get_tokenizer_type(self.app.current_model)
+        return [self.app._count_with(tokenizer, tokenizer_type, segment, add_special_tokens=False)
+                for segment in segments]
+
+    def _split(self, text: str) -> List[str]:
+        if self.segment_size is None:
+            return [text] if text else []
+        return split_segments(text, self.segment_size)
+
+    def _reindex(self) -> None:
+        self.starts = []
+        position = 0
+        for segment in self.segments:
+            self.starts.append(position)
+            position += len(segment)
+
+    def set_text(self, text: str) -> int:
+        """Replace the whole document, reusing unchanged segments; returns the token count"""
+        old = self.text
+        if not self.segments:
+            self.text = text
+            self.segments = self._split(text)
+            self.counts = self._count_segments(self.segments)
+            self.segment_tokens = sum(self.counts)
+            self.last_recounted = len(self.segments)
+            self._reindex()
+            return self.token_count
+
+        if text == old:
+            self.last_recounted = 0
+            return self.token_count
+
+        prefix = _common_prefix(old, text)
+        suffix = _common_suffix(old, text, min(len(old), len(text)) - prefix)
+        return self.edit(prefix, len(old) - suffix, text[prefix:len(text) - suffix])
+
+    def append(self, text: str) -> int:
+        """Append text (e.g. the next line of a prompt); returns the token count"""
+        return self.edit(len(self.text), len(self.text), text)
+
+    def edit(self, start: int, end: int, replacement: str) -> int:
+        """Replace text[start:end] with replacement; returns the token count"""
+        new_text = self.text[:start] + replacement + self.text[end:]
+        if not self.segments:
+            return self.set_text(new_text)
+
+        # Segments overlapping the edited range, widened by two on the left and
+        # one on the right so that the boundaries we keep are untouched by the edit
+        first = max(bisect_right(self.starts, start) - 1 - 2, 0)
+        last = min(bisect_right(self.starts, max(end - 1, 0)) + 1, len(self.segments) - 1)
+
+        region_start = self.starts[first]
+        region_end = self.starts[last] + len(self.segments[last]) + len(replacement) - (end - start)
+        new_segments = self._split(new_text[region_start:region_end])
+        new_counts = self._count_segments(new_segments)
+
+        self.segment_tokens += sum(new_counts) - sum(self.counts[first:last + 1])
+        self.segments[first:last + 1] = new_segments
+        self.counts[first:last + 1] = new_counts
+        self.last_recounted = len(new_segments)
+        self.text = new_text
+        self._reindex()
+        return self.token_count
+
+    @property
+    def token_count(self) -> int:
+        """Tokens for the whole document, with special tokens added once"""
+        if not self.text:
+            return 0
+        if self.app._get_tokenizer_type(self.app.current_model) == "transformers":
+            return self.segment_tokens + self.app.tokenizers[self.app.current_model].num_special_tokens_to_add()
+        return self.segment_tokens
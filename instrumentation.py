@@ -0,0 +1,187 @@
+"""
+Instrumentation - opt-in call metrics for TokenizerApp and a cProfile/tracemalloc wrapper
+"""
+
+
+import bisect
+import cProfile
+import functools
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Latency histogram bucket upper bounds in seconds (Prometheus style, +Inf implied)
+LATENCY_BUCKETS = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0]
+
+INSTRUMENTED_METHODS = [
+    "load_tokenizer",
+    "tokenize_text",
+    "tokenize_batch",
+    "count_tokens",
+    "count_batch",
+    "decode_tokens",
+]
+
+
+def _text_bytes(texts) -> int:
+    """UTF-8 size of a string or list of strings"""
+    if isinstance(texts, str):
+        return len(texts.encode("utf-8", "surrogatepass"))
+    return sum(len(text.encode("utf-8", "surrogatepass")) for text in texts)
+
+
+def _tokens_out(method: str, args: tuple, result) -> int:
+    """Number of tokens produced (or consumed, for decode) by a call"""
+    if method == "tokenize_text":
+        return result[1]
+    if method == "tokenize_batch":
+        return sum(result[1])
+    if method == "count_tokens":
+        return result
+    if method == "count_batch":
+        return sum(result)
+    if method == "decode_tokens":
+        return len(args[0])
+    return 0
+
+
+class Metrics:
+    """Thread-safe call counters and latency histograms per (method, model, backend)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series: Dict[Tuple[str, str, str], Dict] = {}
+
+    def record(self, method: str, model: str, backend: str, seconds: float,
+               bytes_in: int = 0, tokens: int = 0) -> None:
+        """Record one call"""
+        key = (method, model or "none", backend)
+        with self.lock:
+            entry = self.series.get(key)
+            if entry is None:
+                entry = {"calls": 0, "bytes_in": 0, "tokens": 0, "seconds": 0.0,
+                         "buckets": [0] * (len(LATENCY_BUCKETS) + 1)}
+                self.series[key] = entry
+            entry["calls"] += 1
+            entry["bytes_in"] += bytes_in
+            entry["tokens"] += tokens
+            entry["seconds"] += seconds
+            entry["buckets"][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def instrument(self, app) -> None:
+        """Wrap the hot TokenizerApp methods on one instance with timing"""
+        for method in INSTRUMENTED_METHODS:
+            setattr(app, method, self._wrap(app, method, getattr(app, method)))
+
+    def _wrap(self, app, method: str, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            if method == "load_tokenizer":
+                model = args[0] if args else kwargs.get("model")
+                self.record(method, model, app._get_tokenizer_type(model), elapsed)
+            else:
+                model = app.current_model
+                backend = app._get_tokenizer_type(model) if model else "none"
+                bytes_in = _text_bytes(args[0]) if args and method != "decode_tokens" else 0
+                self.record(method, model, backend, elapsed, bytes_in, _tokens_out(method, args, result))
+            return result
+        return wrapper
+
+    def to_dict(self) -> List[Dict]:
+        """Snapshot of all series"""
+        with self.lock:
+            return [
+                {
+                    "method": method,
+                    "model": model,
+                    "backend": backend,
+                    "calls": entry["calls"],
+                    "bytes_in": entry["bytes_in"],
+                    "tokens": entry["tokens"],
+                    "seconds": entry["seconds"],
+                    "latency_buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], entry["buckets"])),
+                }
+                for (method, model, backend), entry in sorted(self.series.items())
+            ]
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Render in the Prometheus text exposition format"""
+        lines = [
+            "# HELP tokenizer_calls_total Calls per TokenizerApp method",
+            "# TYPE tokenizer_calls_total counter",
+        ]
+        series = self.to_dict()
+        for entry in series:
+            lines.append(f"tokenizer_calls_total{{{self._labels(entry)}}} {entry['calls']}")
+
+        lines += ["# HELP tokenizer_bytes_in_total UTF-8 bytes of text passed in",
+                  "# TYPE tokenizer_bytes_in_total counter"]
+        for entry in series:
+            lines.append(f"tokenizer_bytes_in_total{{{self._labels(entry)}}} {entry['bytes_in']}")
+
+        lines += ["# HELP tokenizer_tokens_total Tokens produced (decode: consumed)",
+                  "# TYPE tokenizer_tokens_total counter"]
+        for entry in series:
+            lines.append(f"tokenizer_tokens_total{{{self._labels(entry)}}} {entry['tokens']}")
+
+        lines += ["# HELP tokenizer_latency_seconds Call latency",
+                  "# TYPE tokenizer_latency_seconds histogram"]
+        for entry in series:
+            labels = self._labels(entry)
+            cumulative = 0
+            for bound, count in entry["latency_buckets"].items():
+                cumulative += count
+                lines.append(f'tokenizer_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"tokenizer_latency_seconds_sum{{{labels}}} {entry['seconds']}")
+            lines.append(f"tokenizer_latency_seconds_count{{{labels}}} {entry['calls']}")
+
+        return "\n".join(lines) + "\n"
+
+    def _labels(self, entry: Dict) -> str:
+        return f'method="{entry["method"]}",model="{entry["model"]}",backend="{entry["backend"]}"'
+
+    def write(self, path: str, fmt: str = "json") -> None:
+        """Write metrics to a file as JSON or Prometheus text"""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus() if fmt == "prometheus" else self.to_json())
+
+
+def run_profiled(fn: Callable, output: Optional[str] = None, top: int = 25):
+    """Run fn under cProfile and tracemalloc, then print a report to stderr"""
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(fn)
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(top)
+
+        print("\n======= Profile =======", file=sys.stderr)
+        print(stream.getvalue(), file=sys.stderr)
+        print(f"Python heap: current {current / (1 << 20):.1f} MiB, peak {peak / (1 << 20):.1f} MiB "
+              f"(native allocations by tiktoken/tokenizers are not traced)", file=sys.stderr)
+        print("Top allocation sites:", file=sys.stderr)
+        for stat in snapshot.statistics("lineno")[:10]:
+            print(f"  {stat}", file=sys.stderr)
+
+        if output:
+            stats.dump_stats(output)
+            print(f"cProfile data written to {output}", file=sys.stderr)
@@ -0,0 +1,95 @@
+"""
+Reasoning runner - drives the analyse/think/output/validate/result loop, asking for every step
+in one request and falling back to one request per step when the reply doesn't validate
+"""
+
+
+import os
+from typing import Dict, Iterator, Optional
+
+from step_stream import StepStream, validate_step
+
+
+STEP_SEQUENCE = ["analyse", "think", "output", "validate", "result"]
+
+SINGLE_REQUEST_PROMPT = (
+    "User Input: {query}\n"
+    "Respond with all steps in this one response: a separate JSON object for each step, "
+    "from analyse through result, one per line."
+)
+STEPWISE_QUERY_PROMPT = (
+    "User Input: {query}\n"
+    "Respond one step at a time: wait for the next prompt before giving each step, starting with analyse."
+)
+STEPWISE_PROMPT = "Next step, please respond in JSON"
+
+# "single" asks for every step in one request; "stepwise" sends one request per step
+DEFAULT_MODE = os.getenv("REASONING_MODE", "single")
+
+
+def step_allowed(previous: Optional[str], step: Optional[str]) -> bool:
+    """Whether step may follow previous in STEP_SEQUENCE ("think" may repeat)"""
+    if step not in STEP_SEQUENCE:
+        return False
+    if previous is None:
+        return step == STEP_SEQUENCE[0]
+    if step == previous == "think":
+        return True
+    return STEP_SEQUENCE.index(step) == STEP_SEQUENCE.index(previous) + 1
+
+
+class ReasoningRunner:
+    """Yields the step objects for a query from a chat session
+
+    In single-request mode the whole chain is requested at once and checked
+    against STEP_SEQUENCE as it streams in. At the first out-of-order or
+    empty step, or if the reply ends before "result", the runner falls back
+    to stepwise requests. The model's history already holds the valid steps,
+    so it continues from there.
+    """
+
+    def __init__(self, chat, mode: str = DEFAULT_MODE, stepwise_prompt: str = STEPWISE_PROMPT,
+                 max_round_trips: int = 20):
+        self.chat = chat
+        self.single_request = mode != "stepwise"
+        self.stepwise_prompt = stepwise_prompt
+        self.max_round_trips = max_round_trips
+        self.round_trips = 0
+        self.fell_back = False
+        self.unparsed = False  # The last reply held no JSON object
+        self.last_text = ""
+
+    def _send(self, message: str) -> StepStream:
+        self.round_trips += 1
+        return StepStream(self.chat.send_message(message, stream=True))
+
+    def steps(self, query: str) -> Iterator[Dict]:
+        if self.single_request:
+            stream = self._send(SINGLE_REQUEST_PROMPT.format(query=query))
+            steps = iter(stream)
+            previous = None
+            for parsed in steps:
+                step = parsed.get("step")
+                if not step_allowed(previous, step) or validate_step(parsed):
+                    break
+                previous = step
+                yield parsed
+                if step == STEP_SEQUENCE[-1]:
+                    return
+            for _ in steps:
+                pass  # Finish reading the reply so the chat history is complete
+            self.last_text = stream.text
+            self.fell_back = True
+        else:
+            self.round_trips += 1
+            self.chat.send_message(STEPWISE_QUERY_PROMPT.format(query=query))
+
+        while self.round_trips < self.max_round_trips:
+            stream = self._send(self.stepwise_prompt)
+            parsed = None
+            for parsed in stream:
+                yield parsed
+            self.last_text = stream.text
+            if parsed is None:
+                self.unparsed = True
+                return
@@ -0,0 +1,211 @@
+"""
+Response cache - exact-match cache of model responses, keyed by model, system instruction, normalized contents
+and request options
+"""
+
+
+import dataclasses
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from token_cache import TwoTierCache
+
+
+DEFAULT_RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "tokenizer", "responses.sqlite")
+)
+DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds; 0 means never expire
+
+
+def normalize_contents(contents: Any) -> Any:
+    """Canonical form of prompt contents: unified line endings, outer whitespace stripped"""
+    if isinstance(contents, str):
+        return contents.replace("\r\n", "\n").strip()
+    if isinstance(contents, (list, tuple)):
+        return [normalize_contents(item) for item in contents]
+    if isinstance(contents, dict):
+        return {key: normalize_contents(value) for key, value in contents.items()}
+    if hasattr(contents, "parts"):  # Content objects from either Gemini SDK
+        return {"role": contents.role, "parts": [normalize_contents(part.text) for part in contents.parts]}
+    return contents
+
+
+def canonical_options(options: Any) -> Any:
+    """JSON-ready form of request options: dicts, lists, and config objects from either Gemini SDK"""
+    if isinstance(options, dict):
+        return {str(key): canonical_options(value) for key, value in options.items() if value is not None}
+    if isinstance(options, (list, tuple)):
+        return [canonical_options(value) for value in options]
+    if hasattr(options, "model_dump"):  # google.genai config types
+        return canonical_options(options.model_dump(exclude_none=True, mode="json"))
+    if hasattr(type(options), "to_dict"):  # proto-plus messages (google.generativeai)
+        return canonical_options(type(options).to_dict(options))
+    if dataclasses.is_dataclass(options) and not isinstance(options, type):
+        return canonical_options(dataclasses.asdict(options))
+    return options
+
+
+def response_key(model: str, system_instruction: Optional[str], contents: Any, options: Any = None) -> bytes:
+    """Hash the request fields that determine the response
+
+    options holds everything else sent with the request (generation config,
+    response schema, safety settings...), so a call with different settings
+    never gets another call's cached response.
+    """
+    payload = json.dumps([model, normalize_contents(system_instruction), normalize_contents(contents),
+                          canonical_options(options)], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class CachedResponse:
+    """Stands in for a model response served from the cache"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class ResponseCache(TwoTierCache):
+    """Two-tier response cache: a bounded in-memory LRU backed by SQLite, with a TTL on both tiers"""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS responses ("
+        "digest BLOB PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL"
+        ") WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)",
+    )
+
+    def __init__(self, path: Optional[str] = DEFAULT_RESPONSE_CACHE_PATH, ttl: float = DEFAULT_TTL,
+                 max_memory_entries: int = 1000, max_disk_entries: int = 100_000):
+        super().__init__(path, max_memory_entries)
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.expired = 0
+        self._disk_entries = 0
+        if self.conn is not None:
+            self._disk_entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: bytes) -> Optional[str]:
+        """Look up a cached response, or None on a miss or an expired entry"""
+        now = time.time()
+        with self._lock:
+            entry = self.memory.get(key)
+            from_disk = False
+            if entry is None and self.conn is not None:
+                row = self.conn.execute("SELECT created, response FROM responses WHERE digest = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = row
+                    from_disk = True
+
+            if entry is not None:
+                created, response = entry
+                if not self.ttl or now - created < self.ttl:
+                    if from_disk:
+                        self.conn.execute("UPDATE responses SET last_used = ? WHERE digest = ?", (now, key))
+                        self._remember(key, (created, response))
+                        self.disk_hits += 1
+                    else:
+                        self.memory.move_to_end(key)
+                        self.memory_hits += 1
+                    return response
+
+                # Expired: drop it from both tiers
+                self.memory.pop(key, None)
+                if self.conn is not None:
+                    self._disk_entries -= self.conn.execute("DELETE FROM responses WHERE digest = ?", (key,)).rowcount
+                self.expired += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, response: str) -> None:
+        """Store a response in both tiers, evicting the least recently used entries"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, (now, response))
+
+            if self.conn is not None:
+                cursor = self.conn.execute("INSERT OR IGNORE INTO responses VALUES (?, ?, ?, ?)",
+                                           (key, response, now, now))
+                if cursor.rowcount:
+                    self._disk_entries += 1
+                else:
+                    self.conn.execute("UPDATE responses SET response = ?, created = ?, last_used = ? WHERE digest = ?",
+                                      (response, now, now, key))
+                if self._disk_entries > self.max_disk_entries:
+                    excess = self._disk_entries - self.max_disk_entries
+                    self.conn.execute(
+                        "DELETE FROM responses WHERE digest IN "
+                        "(SELECT digest FROM responses ORDER BY last_used LIMIT ?)", (excess,)
+                    )
+                    self._disk_entries -= excess
+                self.conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters for both tiers, plus expiries and the on-disk entry count"""
+        stats = super().stats()
+        stats.update(expired=self.expired, disk_entries=self._disk_entries)
+        return stats
+
+
+def _system_instruction(config: Any) -> Optional[str]:
+    if config is None:
+        return None
+    if isinstance(config, dict):
+        return config.get("system_instruction")
+    return getattr(config, "system_instruction", None)
+
+
+class CachedModels:
+    """Caches client.models.generate_content (google.genai) responses"""
+
+    def __init__(self, models, cache: ResponseCache):
+        self.models = models
+        self.cache = cache
+
+    def generate_content(self, model: str, contents: Any, config: Any = None, **kwargs):
+        key = response_key(model, _system_instruction(config), contents, {"config": config, **kwargs})
+        text = self.cache.get(key)
+        if text is not None:
+            return CachedResponse(text)
+
+        response = self.models.generate_content(model=model, contents=contents, config=config, **kwargs)
+        self.cache.put(key, response.text)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.models, name)
+
+
+class CachedChat:
+    """Caches chat.send_message (google.generativeai) responses, keyed on the history plus the message
+
+    A cache hit appends the exchange to the session's history, so later
+    messages see the same conversation they would have without the cache.
+    """
+
+    def __init__(self, chat, cache: ResponseCache, model: str, system_instruction: Optional[str] = None):
+        self.chat = chat
+        self.cache = cache
+        self.model = model
+        self.system_instruction = system_instruction
+
+    def send_message(self, content: str, **kwargs):
+        if kwargs.get("stream"):
+            return self.chat.send_message(content, **kwargs)  # Streamed text isn't known until consumed
+
+        history = list(self.chat.history)
+        key = response_key(self.model, self.system_instruction, history + [content], kwargs)
+        text = self.cache.get(key)
+        if text is not None:
+            self.chat.history = history + [{"role": "user", "parts": [content]}, {"role": "model", "parts": [text]}]
+            return CachedResponse(text)
+
+        response = self.chat.send_message(content, **kwargs)
+        self.cache.put(key, response.text)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.chat, name)
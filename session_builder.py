@@ -0,0 +1,52 @@
+"""
+Session builder - sets a system prompt once as a model-level system instruction and shares one
+configured model object, and the prompt's token count, across chat sessions
+
+Set FAKE_MODEL to build sessions on the local fake model (see fake_model.py).
+"""
+
+
+import os
+from typing import Optional
+
+from history_budget import DEFAULT_BUDGET, DEFAULT_TOKENIZER_MODEL, BudgetedChat, load_budget_tokenizer
+
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+
+def _model_class():
+    if os.getenv("FAKE_MODEL"):
+        from fake_model import FakeGenerativeModel
+        return FakeGenerativeModel
+
+    import google.generativeai as genai
+    return genai.GenerativeModel
+
+
+class SessionBuilder:
+    """Starts chat sessions on one model configured with the system prompt
+
+    The prompt goes with every request as the model's system instruction, so
+    a session doesn't spend a round trip sending it and it never piles up in
+    the history. Its token count is computed once and charged to every
+    session's history budget.
+    """
+
+    def __init__(self, system_prompt: str, model_name: str = DEFAULT_MODEL, budget: int = DEFAULT_BUDGET,
+                 tokenizer_model: str = DEFAULT_TOKENIZER_MODEL, model_class=None):
+        self.system_prompt = system_prompt
+        self.model_name = model_name
+        self.model = (model_class or _model_class())(model_name, system_instruction=system_prompt)
+        self.app = load_budget_tokenizer(tokenizer_model) if budget else None
+        self.budget = budget if self.app is not None else 0
+        self.prompt_tokens: Optional[int] = None
+        if self.app is not None:
+            self.prompt_tokens = self.app.count_message({"role": "system", "content": system_prompt})
+        self.sessions = 0
+
+    def start(self) -> BudgetedChat:
+        """A new chat session with an empty history"""
+        self.sessions += 1
+        return BudgetedChat(self.model.start_chat(), app=self.app, budget=self.budget,
+                            system_tokens=self.prompt_tokens or 0)
@@ -0,0 +1,217 @@
+"""
+Step streaming - parses {"step": ...} JSON objects out of a model response as its chunks arrive
+"""
+
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# Characters that change brace depth or start a string, and the rest of a string body
+_STRUCTURE = re.compile(r'[{}"]')
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_NON_SPACE = re.compile(r"\S")
+
+
+class JSONObjectStream:
+    """Incrementally extracts top-level JSON objects from streamed text in one linear pass
+
+    Strings are skipped with one regex match and text between objects with
+    str.find, so each character is scanned once across all chunks and an
+    object is parsed as soon as its closing brace arrives. Text between
+    objects (markdown fences, prose) is skipped, and a "{" not followed by a
+    quote or "}" is treated as prose.
+
+    If a balanced candidate still fails to parse, its direct child objects
+    are tried instead. The children don't overlap, so recovery stays linear.
+    """
+
+    def __init__(self):
+        self._reset()
+        self.in_string = False
+        self.escaped = False  # Chunk ended on a backslash inside a string
+
+    def _reset(self) -> None:
+        self.parts: List[str] = []  # Pieces of the object currently open
+        self.length = 0  # Characters in parts
+        self.depth = 0
+        self.opens: List[int] = []  # Offsets of nested "{" within the open object
+        self.children: List[Tuple[int, int]] = []  # Completed depth-1 spans within the open object
+        self.pending = False  # Opening "{" seen, first non-space character not yet
+
+    def feed(self, text: str) -> List[Dict]:
+        """Consume the next chunk and return the objects it completed"""
+        objects = []
+        if not text:
+            return objects
+        start = 0 if self.depth else None
+        position = 0
+
+        if self.pending and not self._confirm(text, 0):
+            if self.pending:  # Only whitespace so far
+                self.parts.append(text)
+                self.length += len(text)
+                return objects
+            start = None
+
+        if self.in_string:
+            position = self._skip_string(text, 1 if self.escaped else 0)
+
+        while position is not None:
+            if not self.depth:
+                # Between objects only an opening brace matters
+                i = text.find("{", position)
+                if i < 0:
+                    break
+                self._reset()
+                self.depth = 1
+                self.pending = True
+                start = i
+                if not self._confirm(text, i + 1) and not self.pending:
+                    start = None
+                position = i + 1
+                continue
+
+            match = _STRUCTURE.search(text, position)
+            if match is None:
+                break
+            i = match.start()
+            char = match.group()
+
+            if char == '"':
+                position = self._skip_string(text, i + 1)
+                continue
+            if char == "{":
+                self.opens.append(self.length + i - start)
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if not self.depth:
+                    self.parts.append(text[start:i + 1])
+                    objects.extend(self._parse("".join(self.parts), self.children))
+                    self._reset()
+                    start = None
+                elif self.depth == 1:
+                    self.children.append((self.opens.pop(), self.length + i - start))
+                else:
+                    self.opens.pop()
+            position = i + 1
+
+        if self.depth and start is not None:
+            self.parts.append(text[start:])
+            self.length += len(text) - start
+        return objects
+
+    def _skip_string(self, text: str, position: int) -> Optional[int]:
+        """Position after the closing quote, or None if the string runs past the end of the chunk"""
+        match = _STRING_REST.match(text, position)
+        if match is not None:
+            self.in_string = False
+            self.escaped = False
+            return match.end()
+        self.in_string = True
+        # An odd run of trailing backslashes escapes the first character of the next chunk
+        tail = text[position:]
+        self.escaped = (len(tail) - len(tail.rstrip("\\"))) % 2 == 1
+        return None
+
+    def _confirm(self, text: str, position: int) -> bool:
+        """Check that a pending "{" opens an object; returns False if still pending or rejected"""
+        match = _NON_SPACE.search(text, position)
+        if match is None:
+            return False
+        if match.group() in '"}':
+            self.pending = False
+            return True
+        self._reset()
+        return False
+
+    def close(self) -> List[Dict]:
+        """End of input: recover complete child objects of an object that never closed"""
+        objects = []
+        if self.depth and self.children:
+            candidate = "".join(self.parts)
+            objects = self._parse_children(candidate, self.children)
+        self._reset()
+        self.in_string = False
+        self.escaped = False
+        return objects
+
+    @classmethod
+    def _parse(cls, candidate: str, children: List[Tuple[int, int]]) -> List[Dict]:
+        try:
+            parsed = json.loads(candidate)
+        except json.JSONDecodeError:
+            return cls._parse_children(candidate, children)
+        return [parsed] if isinstance(parsed, dict) else []
+
+    @staticmethod
+    def _parse_children(candidate: str, children: List[Tuple[int, int]]) -> List[Dict]:
+        objects = []
+        for child_start, child_end in children:
+            try:
+                parsed = json.loads(candidate[child_start:child_end + 1])
+            except json.JSONDecodeError:
+                continue
+            objects.append(parsed)
+        return objects
+
+
+def extract_json_objects(text: str) -> List[Dict]:
+    """Every complete top-level JSON object in a full model response"""
+    stream = JSONObjectStream()
+    return stream.feed(text) + stream.close()
+
+
+def validate_step(parsed: Dict) -> Optional[str]:
+    """Check a step object against the step schema; returns the problem, or None if valid
+
+    Every step needs a "step" name. Action steps need a "function" or a
+    non-empty "calls" list of {"function", "input"} objects, and every other
+    step needs non-empty "content".
+    """
+    step = parsed.get("step")
+    if not isinstance(step, str) or not step:
+        return "missing 'step'"
+
+    if step == "action":
+        calls = parsed.get("calls")
+        if calls is None:
+            return None if isinstance(parsed.get("function"), str) else "action without 'function'"
+        if not isinstance(calls, list) or not calls or \
+                not all(isinstance(call, dict) and isinstance(call.get("function"), str) for call in calls):
+            return "'calls' must be a list of {function, input} objects"
+        return None
+
+    if parsed.get("content") in (None, "", [], {}):
+        return f"{step} step without 'content'"
+    return None
+
+
+class StepStream:
+    """Iterates the JSON objects in a streamed chat response (sync or async) as they complete"""
+
+    def __init__(self, response):
+        self.response = response
+        self.parser = JSONObjectStream()
+        self.chunks: List[str] = []
+
+    def __iter__(self):
+        for chunk in self.response:
+            self.chunks.append(chunk.text)
+            yield from self.parser.feed(chunk.text)
+        yield from self.parser.close()
+
+    async def __aiter__(self):
+        async for chunk in self.response:
+            self.chunks.append(chunk.text)
+            for parsed in self.parser.feed(chunk.text):
+                yield parsed
+        for parsed in self.parser.close():
+            yield parsed
+
+    @property
+    def text(self) -> str:
+        """Everything received so far"""
+        return "".join(self.chunks)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Stub model server - a local stand-in for the Gemini generateContent REST endpoint, for load tests
+"""
+
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubModelHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1beta/models/<model>:generateContent after a simulated latency"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send(400, {"error": {"code": 400, "message": "Invalid JSON", "status": "INVALID_ARGUMENT"}})
+            return
+
+        if not self.path.split("?")[0].endswith(":generateContent"):
+            self._send(404, {"error": {"code": 404, "message": f"Unknown path {self.path}", "status": "NOT_FOUND"}})
+            return
+
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            throttled = random.random() < server.error_rate
+        if throttled:
+            self._send(429, {"error": {"code": 429, "message": "Resource exhausted", "status": "RESOURCE_EXHAUSTED"}})
+            return
+
+        time.sleep(random.uniform(server.latency * 0.5, server.latency * 1.5))
+
+        prompt = " ".join(
+            part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", [])
+        )
+        text = f"Stub answer to: {prompt[:200]}"
+        self._send(200, {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+            "usageMetadata": {
+                "promptTokenCount": len(prompt.split()),
+                "candidatesTokenCount": len(text.split()),
+                "totalTokenCount": len(prompt.split()) + len(text.split()),
+            },
+        })
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep load tests quiet
+
+
+class StubModelServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, latency: float = 0.2, error_rate: float = 0.0):
+        super().__init__(address, StubModelHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stub Gemini generateContent endpoint")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Mean response latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 429 RESOURCE_EXHAUSTED")
+    args = parser.parse_args()
+
+    server = StubModelServer((args.host, args.port), latency=args.latency, error_rate=args.error_rate)
+    print(f"Stub model server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Stub weather server - a local stand-in for wttr.in, so weather_agent.py can run and be tested offline
+
+Point the agent at it with WEATHER_API_URL=http://127.0.0.1:8791.
+"""
+
+
+import argparse
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+
+CONDITIONS = ["Sunny", "Partly cloudy", "Overcast", "Light rain", "Snow", "Fog"]
+
+
+def stub_report(city: str) -> str:
+    """Deterministic "%C+%t" style report for a city"""
+    seed = zlib.crc32(" ".join(city.split()).casefold().encode("utf-8"))
+    return f"{CONDITIONS[seed % len(CONDITIONS)]} {seed % 45 - 10:+d}°C"
+
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    """Answers GET /<city>?format=... after a simulated latency, like wttr.in's one-line format"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        city = unquote(urlsplit(self.path).path.strip("/"))
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+        try:
+            time.sleep(random.uniform(server.latency * 0.5, server.latency * 1.5))
+            if not city or city.casefold() in server.unknown_cities:
+                self._send(404, "Unknown location")
+            else:
+                self._send(200, stub_report(city))
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status: int, text: str) -> None:
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep test runs quiet
+
+
+class StubWeatherServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, latency: float = 0.2, unknown_cities=("nowhere",)):
+        super().__init__(address, StubWeatherHandler)
+        self.latency = latency
+        self.unknown_cities = {city.casefold() for city in unknown_cities}
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0  # Highest number of requests served at once
+        self.lock = threading.Lock()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stub wttr.in for the weather agent")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8791)
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Mean response latency in seconds")
+    args = parser.parse_args()
+
+    server = StubWeatherServer((args.host, args.port), latency=args.latency)
+    print(f"Stub weather server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
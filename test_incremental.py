@@ -0,0 +1,154 @@
+"""
+Randomized edit-equivalence tests for IncrementalTokenizer: after every edit, the running
+count must equal a full re-encode of the document
+
+Tokenizers are built locally, so the tests never touch the network. Run with
+python -m unittest test_incremental (or pytest).
+"""
+
+
+import os
+import random
+import tempfile
+import unittest
+
+from incremental import IncrementalTokenizer
+from tokenizer import TokenizerApp
+
+
+ALPHABET = ["the", "cat", "sat", "on", "mat", "tokens", "Ünïcode", "42", "3.14", "!", "?", ",",
+            "'s", " ", "  ", "\n", "\n\n", "\t", "    ", "→", "日本語"]
+
+
+def byte_level_encoding():
+    """A small tiktoken encoding with cl100k_base's pre-tokenizer regex"""
+    import tiktoken
+
+    ranks = {bytes([i]): i for i in range(256)}
+    for pair in [b"th", b"he", b"the", b" t", b" the", b"at", b" c", b" cat", b"on", b" on", b"\n\n", b"  "]:
+        ranks[pair] = len(ranks)
+    pat_str = (r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+"""
+               r"""|\s++$|\s*[\r\n]|\s+(?!\S)|\s""")
+    return tiktoken.Encoding("test_cl100k", pat_str=pat_str, mergeable_ranks=ranks, special_tokens={})
+
+
+def sentencepiece_style_tokenizer():
+    """A fast tokenizer with a Mistral-style pipeline: Prepend("▁") normalizer, no pre-tokenizer"""
+    from tokenizers import Tokenizer, models, normalizers, processors, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    rng = random.Random(1)
+    corpus = ["".join(rng.choice(ALPHABET) for _ in range(40)) for _ in range(200)]
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>", byte_fallback=True))
+    tokenizer.normalizer = normalizers.Sequence([normalizers.Prepend("▁"), normalizers.Replace(" ", "▁")])
+    tokenizer.train_from_iterator(corpus, trainer=trainers.BpeTrainer(vocab_size=300, special_tokens=["<unk>", "<s>"]))
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="<s> $A", special_tokens=[("<s>", tokenizer.token_to_id("<s>"))]
+    )
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="<unk>", bos_token="<s>")
+
+
+def bpe_tokenizer(*pre_tokenizers):
+    """A fast byte-fallback BPE tokenizer trained on ALPHABET text, with the given pre-tokenizers"""
+    from tokenizers import Tokenizer, models, pre_tokenizers as pre, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    rng = random.Random(2)
+    corpus = ["".join(rng.choice(ALPHABET) for _ in range(40)) for _ in range(200)]
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>", byte_fallback=True))
+    tokenizer.pre_tokenizer = pre.Sequence(list(pre_tokenizers))
+    tokenizer.train_from_iterator(corpus, trainer=trainers.BpeTrainer(vocab_size=400, special_tokens=["<unk>"]))
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="<unk>")
+
+
+def app_with(model: str, tokenizer) -> TokenizerApp:
+    app = TokenizerApp()
+    app.tokenizers[model] = tokenizer
+    app.current_model = model
+    return app
+
+
+def random_text(rng: random.Random, pieces: int) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(pieces))
+
+
+class IncrementalEditTest(unittest.TestCase):
+
+    def check_random_edits(self, app: TokenizerApp, edits: int = 300, seed: int = 0) -> IncrementalTokenizer:
+        rng = random.Random(seed)
+        expected = random_text(rng, 400)
+        document = IncrementalTokenizer(app, expected, segment_size=64)
+        self.assertEqual(document.token_count, app.count_tokens(expected))
+
+        for i in range(edits):
+            start = rng.randint(0, len(expected))
+            end = min(len(expected), start + rng.choice([0, 0, 1, 5, 30, 200]))
+            replacement = random_text(rng, rng.choice([0, 1, 3, 20]))
+            action = rng.random()
+            if action < 0.1:
+                expected += replacement
+                document.append(replacement)
+            elif action < 0.2:
+                expected = expected[:start] + replacement + expected[end:]
+                document.set_text(expected)
+            else:
+                expected = expected[:start] + replacement + expected[end:]
+                document.edit(start, end, replacement)
+
+            self.assertEqual(document.text, expected)
+            self.assertEqual(document.token_count, app.count_tokens(expected) if expected else 0,
+                             f"count drifted after edit {i}")
+        return document
+
+    def test_byte_level_edits_match_full_encode(self):
+        app = app_with("gpt-4", byte_level_encoding())
+        self.assertTrue(app.supports_chunked_counting())
+        document = self.check_random_edits(app)
+        self.assertGreater(len(document.segments), 1)
+
+    def test_sentencepiece_style_edits_match_full_encode(self):
+        app = app_with("mistral", sentencepiece_style_tokenizer())
+        self.assertFalse(app.supports_chunked_counting())
+        document = self.check_random_edits(app, edits=100)
+        self.assertLessEqual(len(document.segments), 1)
+
+
+class ChunkSafePipelineTest(unittest.TestCase):
+    """Chunked counting is only allowed when a pre-tokenizer splits at the boundaries find_safe_split picks"""
+
+    def assert_file_count_matches(self, app: TokenizerApp, text: str) -> None:
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".txt", delete=False) as f:
+            f.write(text)
+        try:
+            self.assertEqual(app.count_file(f.name, chunk_size=256, show_progress=False), app.count_tokens(text))
+        finally:
+            os.remove(f.name)
+
+    def test_pre_tokenizers_without_whitespace_split_are_not_chunk_safe(self):
+        from tokenizers import pre_tokenizers as pre
+
+        for name, pre_tokenizers in [("digits", [pre.Digits()]), ("punctuation", [pre.Punctuation()]),
+                                     ("string split", [pre.Split(" ", "isolated")])]:
+            with self.subTest(name):
+                app = app_with("mistral", bpe_tokenizer(*pre_tokenizers))
+                self.assertFalse(app.supports_chunked_counting())
+                self.assert_file_count_matches(app, random_text(random.Random(3), 3000))
+
+    def test_whitespace_splitting_pre_tokenizers_are_chunk_safe(self):
+        from tokenizers import Regex, pre_tokenizers as pre
+
+        gpt2_pattern = r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+        gpt_split = pre.Split(Regex(gpt2_pattern), "isolated")
+        for name, pre_tokenizers in [("digits + whitespace", [pre.Digits(), pre.Whitespace()]),
+                                     ("whitespace split", [pre.WhitespaceSplit()]),
+                                     ("gpt-2 regex split", [gpt_split, pre.ByteLevel(add_prefix_space=False,
+                                                                                     use_regex=False)]),
+                                     ("byte level", [pre.ByteLevel(add_prefix_space=False)])]:
+            with self.subTest(name):
+                app = app_with("mistral", bpe_tokenizer(*pre_tokenizers))
+                self.assertTrue(app.supports_chunked_counting())
+                self.assert_file_count_matches(app, random_text(random.Random(3), 3000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+"""
+Tests for the response cache: TTL expiry and LRU bounds on both tiers, and the CachedModels/CachedChat
+wrappers against the fake model, including that requests with different options never share an entry
+
+Run with python -m unittest test_response_cache (or pytest).
+"""
+
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from google.genai import types
+
+from fake_model import FakeClient, FakeGenerativeModel
+from response_cache import CachedChat, CachedModels, ResponseCache, response_key
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "responses.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_disk_tier_survives_reopen(self):
+        cache = ResponseCache(self.path, ttl=0)
+        cache.put(b"k", "answer")
+        cache.close()
+
+        cache = ResponseCache(self.path, ttl=0)
+        self.assertEqual(cache.get(b"k"), "answer")
+        self.assertEqual(cache.get(b"k"), "answer")
+        self.assertEqual((cache.disk_hits, cache.memory_hits), (1, 1))
+        cache.close()
+
+    def test_ttl_expires_both_tiers(self):
+        cache = ResponseCache(self.path, ttl=60)
+        with mock.patch("response_cache.time.time", return_value=1000.0):
+            cache.put(b"k", "answer")
+        with mock.patch("response_cache.time.time", return_value=1059.0):
+            self.assertEqual(cache.get(b"k"), "answer")
+        with mock.patch("response_cache.time.time", return_value=1061.0):
+            self.assertIsNone(cache.get(b"k"))
+        self.assertEqual(cache.stats()["expired"], 1)
+        self.assertEqual(cache.stats()["disk_entries"], 0)
+        cache.close()
+
+    def test_lru_bounds(self):
+        cache = ResponseCache(self.path, ttl=0, max_memory_entries=2, max_disk_entries=3)
+        for index in range(5):
+            with mock.patch("response_cache.time.time", return_value=1000.0 + index):
+                cache.put(bytes([index]), str(index))
+        self.assertEqual(len(cache.memory), 2)
+        self.assertEqual(cache.stats()["disk_entries"], 3)
+        self.assertIsNone(cache.get(bytes([0])))
+        self.assertIsNone(cache.get(bytes([1])))
+        self.assertEqual(cache.get(bytes([2])), "2")
+        cache.close()
+
+
+class ResponseKeyTest(unittest.TestCase):
+
+    def test_contents_are_normalized(self):
+        self.assertEqual(response_key("m", None, "  hi\r\nthere \n"), response_key("m", None, "hi\nthere"))
+
+    def test_options_are_part_of_the_key(self):
+        base = response_key("m", "sys", "hi", {"config": types.GenerateContentConfig(temperature=0.1)})
+        self.assertNotEqual(base, response_key("m", "sys", "hi", {"config": types.GenerateContentConfig(temperature=0.9)}))
+        self.assertNotEqual(base, response_key("m", "sys", "hi"))
+        # The same settings give the same key however they are written
+        self.assertEqual(base, response_key("m", "sys", "hi", {"config": {"temperature": 0.1}}))
+
+
+class CachedModelsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient(latency=0)
+        self.cache = ResponseCache(None, ttl=0)
+        self.models = CachedModels(self.client.models, self.cache)
+
+    def test_repeated_request_is_served_from_cache(self):
+        first = self.models.generate_content(model="m", contents="hi")
+        second = self.models.generate_content(model="m", contents=" hi\n")
+        self.assertEqual(second.text, first.text)
+        self.assertEqual(self.client.models.calls, 1)
+
+    def test_different_config_is_not_shared(self):
+        for config in [None,
+                       types.GenerateContentConfig(system_instruction="be brief"),
+                       types.GenerateContentConfig(system_instruction="be brief", temperature=0.0),
+                       types.GenerateContentConfig(system_instruction="be brief", response_mime_type="application/json")]:
+            self.models.generate_content(model="m", contents="hi", config=config)
+        self.assertEqual(self.client.models.calls, 4)
+        self.models.generate_content(model="m", contents="hi",
+                                     config=types.GenerateContentConfig(system_instruction="be brief", temperature=0.0))
+        self.assertEqual(self.client.models.calls, 4)
+
+
+class CachedChatTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(None, ttl=0)
+        self.model = FakeGenerativeModel(replies=["first", "second"], delay=0, latency=0)
+
+    def chat(self) -> CachedChat:
+        return CachedChat(self.model.start_chat(), self.cache, "fake")
+
+    def test_hit_replays_history(self):
+        live = self.chat()
+        self.assertEqual(live.send_message("Next step").text, "first")
+        self.assertEqual(live.send_message("Next step").text, "second")
+
+        replayed = self.chat()
+        self.assertEqual(replayed.send_message("Next step").text, "first")
+        self.assertEqual(replayed.send_message("Next step").text, "second")
+        self.assertEqual(replayed.chat.requests, [])  # Both answers came from the cache
+        self.assertEqual([entry.parts[0].text for entry in replayed.history],
+                         ["Next step", "first", "Next step", "second"])
+
+    def test_generation_config_is_part_of_the_key(self):
+        self.chat().send_message("hello", generation_config={"temperature": 0.0})
+        other = self.chat()
+        other.send_message("hello", generation_config={"temperature": 1.0})
+        other_again = self.chat()
+        other_again.send_message("hello", generation_config={"temperature": 1.0})
+        self.assertEqual(len(other.chat.requests), 1)
+        self.assertEqual(other_again.chat.requests, [])
+
+    def test_streaming_bypasses_cache(self):
+        chat = self.chat()
+        chat.send_message("hello", stream=True)
+        chat = self.chat()
+        chat.send_message("hello", stream=True)
+        self.assertEqual(len(chat.chat.requests), 1)
+        self.assertEqual(self.cache.stats()["misses"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
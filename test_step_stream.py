@@ -0,0 +1,155 @@
+"""
+Tests for the streaming step parser: the objects found must not depend on how the response is
+split into chunks, and strings, fences, prose and unclosed objects must be handled as documented
+
+Run with python -m unittest test_step_stream (or pytest).
+"""
+
+
+import asyncio
+import random
+import unittest
+
+from fake_model import FakeResponse
+from step_stream import JSONObjectStream, StepStream, extract_json_objects, validate_step
+
+
+RESPONSES = [
+    '```json\n{ "step": "analyse", "content": "a" }\n```\n{"step": "think", "content": "b"}',
+    'Sure! {"step": "output", "content": "brace } and { and \\"quote\\" and \\\\"}',
+    'set {x} then {"step": "result", "content": "ok"}',
+    '{"bad": , {"step": "think", "content": "c"}}',
+    '{"step": "output", "content": "multi\\nline", "extra": {"nested": [1, {"deep": true}]}}',
+    '{"step": "action", "calls": [{"function": "get_weather", "input": "paris"}]}\n'
+    '{"step": "observe", "content": "{\\"not\\": \\"an object\\"} \\\\\\\\ \\u00e9"}',
+    '{}{"step": "think", "content": "adjacent"}{"step": "think", "content": "objects"}',
+    '{ \n\n  "step": "think", "content": "space after the brace"}',
+]
+
+
+def random_chunks(rng: random.Random, text: str):
+    """Split text at random points, including empty and single-character chunks"""
+    chunks = []
+    position = 0
+    while position < len(text):
+        size = rng.choice([0, 1, 1, 2, 3, 7, 16, 64])
+        chunks.append(text[position:position + size])
+        position += size
+    return chunks
+
+
+def feed_all(chunks):
+    stream = JSONObjectStream()
+    objects = []
+    for chunk in chunks:
+        objects.extend(stream.feed(chunk))
+    return objects + stream.close()
+
+
+class ChunkBoundaryTest(unittest.TestCase):
+
+    def test_random_chunking_matches_whole_text(self):
+        rng = random.Random(0)
+        for text in RESPONSES:
+            expected = extract_json_objects(text)
+            self.assertTrue(expected, text)
+            for _ in range(200):
+                self.assertEqual(feed_all(random_chunks(rng, text)), expected, text)
+
+    def test_random_concatenated_responses(self):
+        rng = random.Random(1)
+        for _ in range(100):
+            parts = rng.sample(RESPONSES, 4)
+            text = "\n".join(parts)
+            expected = [obj for part in parts for obj in extract_json_objects(part)]
+            self.assertEqual(feed_all(random_chunks(rng, text)), expected)
+
+    def test_objects_are_returned_as_soon_as_they_close(self):
+        stream = JSONObjectStream()
+        self.assertEqual(stream.feed('{"step": "think", "content": "a"}\n{"step": "out'),
+                         [{"step": "think", "content": "a"}])
+        self.assertEqual(stream.feed('put", "content": "b"}'), [{"step": "output", "content": "b"}])
+
+
+class ParsingTest(unittest.TestCase):
+
+    def test_braces_quotes_and_escapes_inside_strings(self):
+        self.assertEqual(extract_json_objects(RESPONSES[1]),
+                         [{"step": "output", "content": 'brace } and { and "quote" and \\'}])
+
+    def test_backslash_at_chunk_end_escapes_next_chunk(self):
+        self.assertEqual(feed_all(['{"step": "think", "content": "a\\', '"b"}']),
+                         [{"step": "think", "content": 'a"b'}])
+        self.assertEqual(feed_all(['{"step": "think", "content": "a\\\\', '"}']),
+                         [{"step": "think", "content": "a\\"}])
+
+    def test_code_fences_and_prose_are_skipped(self):
+        self.assertEqual(extract_json_objects(RESPONSES[0]),
+                         [{"step": "analyse", "content": "a"}, {"step": "think", "content": "b"}])
+        self.assertEqual(extract_json_objects(RESPONSES[2]), [{"step": "result", "content": "ok"}])
+
+    def test_invalid_object_falls_back_to_its_children(self):
+        self.assertEqual(extract_json_objects(RESPONSES[3]), [{"step": "think", "content": "c"}])
+
+    def test_close_recovers_children_of_unclosed_object(self):
+        stream = JSONObjectStream()
+        text = '{"plan": {"step": "think", "content": "x"}, "next": {"step": "output", "content": "y"}, "tail": "unterm'
+        self.assertEqual(stream.feed(text), [])
+        self.assertEqual(stream.close(), [{"step": "think", "content": "x"}, {"step": "output", "content": "y"}])
+        # close() leaves the parser ready for the next response
+        self.assertEqual(stream.feed('{"step": "result", "content": "z"}'), [{"step": "result", "content": "z"}])
+
+    def test_unclosed_object_without_children_yields_nothing(self):
+        stream = JSONObjectStream()
+        self.assertEqual(stream.feed('{"step": "think", "content": "cut off'), [])
+        self.assertEqual(stream.close(), [])
+
+
+class StepStreamTest(unittest.TestCase):
+
+    def test_sync_and_async_iteration(self):
+        text = "\n".join(RESPONSES[:3])
+        expected = extract_json_objects(text)
+
+        stream = StepStream(FakeResponse(text, delay=0, latency=0))
+        self.assertEqual(list(stream), expected)
+        self.assertEqual(stream.text, text)
+
+        async def collect():
+            stream = StepStream(FakeResponse(text, delay=0, latency=0))
+            return [parsed async for parsed in stream], stream.text
+
+        self.assertEqual(asyncio.run(collect()), (expected, text))
+
+
+class ValidateStepTest(unittest.TestCase):
+
+    def test_valid_steps(self):
+        for parsed in [
+            {"step": "think", "content": "x"},
+            {"step": "observe", "content": [{"function": "f", "output": 1}]},
+            {"step": "action", "function": "get_weather", "input": "paris"},
+            {"step": "action", "calls": [{"function": "get_weather", "input": "paris"}]},
+        ]:
+            with self.subTest(parsed=parsed):
+                self.assertIsNone(validate_step(parsed))
+
+    def test_invalid_steps(self):
+        for parsed, problem in [
+            ({}, "missing 'step'"),
+            ({"step": ""}, "missing 'step'"),
+            ({"step": 3, "content": "x"}, "missing 'step'"),
+            ({"step": "think"}, "think step without 'content'"),
+            ({"step": "output", "content": ""}, "output step without 'content'"),
+            ({"step": "result", "content": {}}, "result step without 'content'"),
+            ({"step": "action"}, "action without 'function'"),
+            ({"step": "action", "calls": []}, "'calls' must be a list of {function, input} objects"),
+            ({"step": "action", "calls": [{"input": "x"}]}, "'calls' must be a list of {function, input} objects"),
+            ({"step": "action", "calls": "get_weather"}, "'calls' must be a list of {function, input} objects"),
+        ]:
+            with self.subTest(parsed=parsed):
+                self.assertEqual(validate_step(parsed), problem)
+
+
+if __name__ == "__main__":
+    unittest.main()
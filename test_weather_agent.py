@@ -0,0 +1,123 @@
+"""
+Parallel get_weather calls and the weather cache, against the local stub weather server instead of wttr.in
+
+Run with python -m unittest test_weather_agent (or pytest).
+"""
+
+
+import asyncio
+import threading
+import time
+import unittest
+
+import weather_agent
+from stub_weather_server import StubWeatherServer, stub_report
+
+
+LATENCY = 0.3
+
+
+class StubWeatherTestCase(unittest.IsolatedAsyncioTestCase):
+    """Points weather_agent at a fresh stub server for each test"""
+
+    def setUp(self):
+        self.server = StubWeatherServer(("127.0.0.1", 0), latency=LATENCY)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.original_url = weather_agent.WEATHER_API_URL
+        weather_agent.WEATHER_API_URL = f"http://{host}:{port}"
+
+    def tearDown(self):
+        weather_agent.WEATHER_API_URL = self.original_url
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def run_calls(self, cities, max_concurrency):
+        runner = weather_agent.ToolRunner(weather_agent.available_tools, max_concurrency=max_concurrency)
+        try:
+            start = time.perf_counter()
+            outputs = await runner.run_all([{"function": "get_weather", "input": city} for city in cities])
+            return outputs, time.perf_counter() - start
+        finally:
+            await runner.close()
+
+
+class ParallelWeatherTest(StubWeatherTestCase):
+
+    async def test_calls_run_in_parallel(self):
+        cities = ["paris", "tokyo", "new york", "lagos"]
+        outputs, elapsed = await self.run_calls(cities, max_concurrency=4)
+
+        self.assertEqual(outputs, [f"The weather in {city} is {stub_report(city)}." for city in cities])
+        self.assertEqual(self.server.requests, 4)
+        self.assertEqual(self.server.max_in_flight, 4)
+        # Sequential calls would take at least 4 * 0.5 * LATENCY
+        self.assertLess(elapsed, 1.5 * LATENCY + 0.3)
+
+    async def test_concurrency_limit(self):
+        cities = [f"city {i}" for i in range(8)]
+        outputs, _ = await self.run_calls(cities, max_concurrency=2)
+
+        self.assertEqual(len(outputs), 8)
+        self.assertEqual(self.server.requests, 8)
+        self.assertLessEqual(self.server.max_in_flight, 2)
+
+    async def test_failed_call_only_affects_itself(self):
+        outputs, _ = await self.run_calls(["paris", "nowhere", "tokyo"], max_concurrency=4)
+
+        self.assertEqual(outputs[1], "Something went wrong")
+        self.assertEqual(outputs[0], f"The weather in paris is {stub_report('paris')}.")
+        self.assertEqual(outputs[2], f"The weather in tokyo is {stub_report('tokyo')}.")
+
+
+class WeatherCacheTest(StubWeatherTestCase):
+
+    async def asyncSetUp(self):
+        self.runner = weather_agent.ToolRunner(weather_agent.available_tools)
+
+    async def asyncTearDown(self):
+        await self.runner.close()
+
+    async def get(self, *cities):
+        return await asyncio.gather(*(weather_agent.get_weather(city, self.runner) for city in cities))
+
+    async def test_concurrent_lookups_share_one_request(self):
+        outputs = await self.get("Paris", "paris", "  PARIS ", "Paris")
+
+        self.assertEqual(outputs, [f"The weather in {city} is {stub_report('paris')}."
+                                   for city in ("Paris", "paris", "  PARIS ", "Paris")])
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(self.runner.weather_cache.stats()["coalesced"], 3)
+
+    async def test_entries_expire_after_ttl(self):
+        self.runner.weather_cache = weather_agent.WeatherCache(ttl=0.5)
+        await self.get("paris")
+        await self.get("paris")
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(self.runner.weather_cache.hits, 1)
+
+        await asyncio.sleep(0.6)
+        await self.get("paris")
+        self.assertEqual(self.server.requests, 2)
+
+    async def test_least_recently_used_entry_is_evicted(self):
+        self.runner.weather_cache = weather_agent.WeatherCache(max_entries=2)
+        await self.get("paris")
+        await self.get("tokyo")
+        await self.get("paris")  # Hit; tokyo is now the least recently used
+        await self.get("lagos")
+        self.assertEqual(list(self.runner.weather_cache.entries), ["paris", "lagos"])
+
+        await self.get("paris")
+        await self.get("tokyo")
+        self.assertEqual(self.server.requests, 4)
+
+    async def test_failed_lookups_are_not_cached(self):
+        self.assertEqual(await self.get("nowhere", "nowhere"), ["Something went wrong"] * 2)
+        await self.get("nowhere")
+        self.assertEqual(self.server.requests, 2)  # One shared request, then a fresh one
+        self.assertEqual(self.runner.weather_cache.entries, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
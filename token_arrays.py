@@ -0,0 +1,109 @@
+"""
+Token arrays - writes tokenized corpora as a flat uint32 .npy plus an offsets index
+"""
+
+
+import os
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+
+def _npy_header(shape: Tuple[int, ...], dtype) -> bytes:
+    """Serialize a .npy v1.0 header for a C-ordered array"""
+    import io
+
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, {
+        "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+        "fortran_order": False,
+        "shape": shape,
+    })
+    return buffer.getvalue()
+
+
+class TokenArrayWriter:
+    """Appends token arrays to <prefix>.tokens.npy and records <prefix>.offsets.npy
+
+    Tokens are streamed to disk as they arrive; the .npy header is written up
+    front with a placeholder length and patched on close. NumPy pads headers so
+    the shape can grow in place, which keeps the patch the same size.
+    """
+
+    def __init__(self, prefix: str):
+        self.tokens_path = f"{prefix}.tokens.npy"
+        self.offsets_path = f"{prefix}.offsets.npy"
+        self.file = open(self.tokens_path, "wb")
+        self.header_size = len(_npy_header((0,), np.uint32))
+        self.file.write(_npy_header((0,), np.uint32))
+        self.offset_chunks: List[np.ndarray] = [np.zeros(1, dtype=np.int64)]
+        self.token_count = 0
+
+    def append(self, flat: np.ndarray, offsets: np.ndarray) -> None:
+        """Append a batch produced by TokenizerApp.encode_batch_array"""
+        flat.astype(np.uint32, copy=False).tofile(self.file)
+        self.offset_chunks.append(offsets[1:] + self.token_count)
+        self.token_count += len(flat)
+
+    @property
+    def document_count(self) -> int:
+        return sum(len(chunk) for chunk in self.offset_chunks) - 1
+
+    def close(self) -> None:
+        """Patch the token header with the final length and write the offsets index"""
+        header = _npy_header((self.token_count,), np.uint32)
+        if len(header) != self.header_size:
+            raise RuntimeError("Token array too large to patch the .npy header in place")
+        self.file.seek(0)
+        self.file.write(header)
+        self.file.close()
+        np.save(self.offsets_path, np.concatenate(self.offset_chunks))
+
+    def __enter__(self):
+        return self
+
+    def discard(self) -> None:
+        """Close and delete the partial output, so a failed run can't be mistaken for a complete one"""
+        self.file.close()
+        os.remove(self.tokens_path)
+        if os.path.exists(self.offsets_path):
+            os.remove(self.offsets_path)  # Left by an earlier run; it indexes the overwritten tokens
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def write_token_arrays(app, texts: Iterable[str], prefix: str, batch_size: int = 1024) -> Tuple[int, int]:
+    """Tokenize texts in batches straight into .npy files; returns (documents, tokens)
+
+    Every text gets an entry in the offsets index, so offsets line up with
+    the input. If a batch fails to tokenize, nothing is written and a
+    ValueError is raised.
+    """
+    def append(batch: List[str]) -> None:
+        flat, offsets = app.encode_batch_array(batch)
+        if len(offsets) - 1 != len(batch):
+            first = writer.document_count
+            raise ValueError(f"Tokenization failed for documents {first}-{first + len(batch) - 1}")
+        writer.append(flat, offsets)
+
+    with TokenArrayWriter(prefix) as writer:
+        batch = []
+        for text in texts:
+            batch.append(text)
+            if len(batch) >= batch_size:
+                append(batch)
+                batch = []
+        if batch:
+            append(batch)
+
+    return writer.document_count, writer.token_count
+
+
+def load_token_arrays(prefix: str, mmap: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """Open the arrays written by write_token_arrays, memory-mapped by default"""
+    mode = "r" if mmap else None
+    return np.load(f"{prefix}.tokens.npy", mmap_mode=mode), np.load(f"{prefix}.offsets.npy", mmap_mode=mode)
@@ -0,0 +1,156 @@
+"""
+Token count cache - content-addressed cache of token counts, keyed by encoding and text hash
+"""
+
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "tokenizer", "token_counts.sqlite")
+
+
+def text_digest(text: str) -> bytes:
+    """Hash text for use as a cache key"""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class TwoTierCache:
+    """A bounded in-memory LRU in front of a SQLite table
+
+    Subclasses list the statements that create their table in SCHEMA and
+    implement the lookups; this class opens the store, keeps the memory tier
+    and the hit/miss counters, and closes the store.
+    """
+
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, path: Optional[str], max_memory_entries: int):
+        self.max_memory_entries = max_memory_entries
+        self.memory: OrderedDict = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = None
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                self.conn.execute(statement)
+
+    def _remember(self, key, value) -> None:
+        """Insert into the memory tier, evicting the least recently used entries"""
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    @property
+    def lookups(self) -> int:
+        """Entries looked up so far, hit or miss"""
+        return self.memory_hits + self.disk_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from either tier"""
+        return (self.memory_hits + self.disk_hits) / self.lookups if self.lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters for both tiers"""
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+            "hit_rate": self.hit_rate,
+        }
+
+    def close(self) -> None:
+        """Flush pending writes and close the on-disk store"""
+        with self._lock:
+            if self.conn is not None:
+                self.conn.commit()
+                self.conn.close()
+                self.conn = None
+
+
+class TokenCountCache(TwoTierCache):
+    """Two-tier token count cache: a bounded in-memory LRU backed by SQLite"""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS token_counts ("
+        "encoding TEXT NOT NULL, digest BLOB NOT NULL, tokens INTEGER NOT NULL, "
+        "PRIMARY KEY (encoding, digest)) WITHOUT ROWID",
+    )
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, max_memory_entries: int = 100_000,
+                 commit_every: int = 1000):
+        super().__init__(path, max_memory_entries)
+        self.commit_every = commit_every
+        self._pending_writes = 0
+
+    def get(self, encoding: str, text: str) -> Optional[int]:
+        """Look up the token count for text, or None on a miss"""
+        return self.get_many(encoding, [text])[0]
+
+    def get_many(self, encoding: str, texts: List[str]) -> List[Optional[int]]:
+        """Look up token counts for many texts; misses are None"""
+        keys = [(encoding, text_digest(text)) for text in texts]
+        counts: List[Optional[int]] = [None] * len(keys)
+        disk_lookups: Dict[bytes, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                count = self.memory.get(key)
+                if count is not None:
+                    self.memory.move_to_end(key)
+                    self.memory_hits += 1
+                    counts[i] = count
+                else:
+                    disk_lookups.setdefault(key[1], []).append(i)
+
+            if disk_lookups and self.conn is not None:
+                digests = list(disk_lookups)
+                for start in range(0, len(digests), 500):  # Stay under SQLite's variable limit
+                    batch = digests[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self.conn.execute(
+                        f"SELECT digest, tokens FROM token_counts WHERE encoding = ? AND digest IN ({placeholders})",
+                        [encoding, *batch],
+                    )
+                    for digest, tokens in rows:
+                        for i in disk_lookups.pop(digest):
+                            counts[i] = tokens
+                            self.disk_hits += 1
+                        self._remember((encoding, digest), tokens)
+
+            self.misses += sum(len(indices) for indices in disk_lookups.values())
+
+        return counts
+
+    def put(self, encoding: str, text: str, tokens: int) -> None:
+        """Store the token count for text"""
+        self.put_many(encoding, [text], [tokens])
+
+    def put_many(self, encoding: str, texts: List[str], counts: List[int]) -> None:
+        """Store token counts for many texts"""
+        rows = [(encoding, text_digest(text), tokens) for text, tokens in zip(texts, counts)]
+
+        with self._lock:
+            for encoding_name, digest, tokens in rows:
+                self._remember((encoding_name, digest), tokens)
+
+            if self.conn is not None:
+                self.conn.executemany("INSERT OR REPLACE INTO token_counts VALUES (?, ?, ?)", rows)
+                self._pending_writes += len(rows)
+                if self._pending_writes >= self.commit_every:
+                    self.conn.commit()
+                    self._pending_writes = 0
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Corpus tokenization - counts tokens for a directory, glob or JSONL file across a process pool
+"""
+
+
+import glob
+import io
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from tokenizer import TokenizerApp
+
+
+JSONL_SHARD_BYTES = 8 << 20  # Byte range of a JSONL file handed to one task
+
+# Per-process tokenizer, loaded once by _init_worker
+_worker_app: Optional[TokenizerApp] = None
+_worker_error: Optional[str] = None
+
+
+def _init_worker(model: str, bundle_dir: Optional[str]) -> None:
+    """Load the tokenizer once per worker process"""
+    global _worker_app, _worker_error
+    app = TokenizerApp(bundle_dir=bundle_dir)
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            app.load_tokenizer(model)
+    except SystemExit:
+        # An initializer that exits is respawned by the pool forever; fail the tasks instead
+        _worker_error = output.getvalue().strip() or f"Could not load the tokenizer for {model}"
+        return
+    sys.stderr.write(output.getvalue())  # Keep load messages out of the results on stdout
+    _worker_app = app
+
+
+def _worker() -> TokenizerApp:
+    if _worker_app is None:
+        raise RuntimeError(_worker_error)
+    return _worker_app
+
+
+def _count_file_task(path: str) -> Tuple[str, int, int, int, Optional[str]]:
+    """Count tokens in one plain-text file; returns (path, documents, tokens, skipped records, error)"""
+    app = _worker()
+    try:
+        return path, 1, app.count_file(path, show_progress=False), 0, None
+    except (OSError, UnicodeDecodeError) as e:
+        return path, 0, 0, 0, str(e)
+
+
+def _count_records(app: TokenizerApp, texts: List[str]) -> Tuple[List[int], Optional[str]]:
+    """Count records one at a time after a batch failed; returns the counts that succeeded and the first error"""
+    counts = []
+    error = None
+    for text in texts:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            count = app.count_batch([text])
+        if count:
+            counts.append(count[0])
+        elif error is None:
+            message = output.getvalue().strip()
+            error = message.splitlines()[0] if message else "unknown error"
+    return counts, error
+
+
+def _count_jsonl_task(shard: Tuple[str, int, int, str]) -> Tuple[str, int, int, int, Optional[str]]:
+    """Count tokens for the JSONL records that start inside a byte range"""
+    app = _worker()
+    path, start, end, text_field = shard
+    texts = []
+
+    try:
+        with open(path, "rb") as f:
+            if start > 0:
+                # The record straddling the start belongs to the previous shard
+                f.seek(start - 1)
+                f.readline()
+
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                text = _extract_text(line, text_field)
+                if text is not None:
+                    texts.append(text)
+    except OSError as e:
+        return path, 0, 0, 0, str(e)
+
+    output = io.StringIO()
+    with redirect_stdout(output):
+        counts = app.count_batch(texts)
+    if len(counts) == len(texts):
+        return path, len(texts), sum(counts), 0, None
+
+    # One bad record (e.g. a special token tiktoken refuses) fails the whole batch; skip only the bad ones
+    counts, error = _count_records(app, texts)
+    sys.stderr.write(f"Warning: skipped {len(texts) - len(counts)} records in {path}: {error}\n")
+    return path, len(counts), sum(counts), len(texts) - len(counts), None
+
+
+def _extract_text(line: bytes, text_field: str) -> Optional[str]:
+    """Pull the text out of one JSONL record"""
+    line = line.strip()
+    if not line:
+        return None
+
+    try:
+        record = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+    if isinstance(record, str):
+        return record
+    if isinstance(record, dict) and isinstance(record.get(text_field), str):
+        return record[text_field]
+    return None
+
+
+def _jsonl_shards(path: str, text_field: str) -> Iterator[Tuple[str, int, int, str]]:
+    """Split a JSONL file into byte-range shards"""
+    size = os.path.getsize(path)
+    for start in range(0, max(size, 1), JSONL_SHARD_BYTES):
+        yield path, start, min(start + JSONL_SHARD_BYTES, size), text_field
+
+
+def resolve_inputs(source: str) -> List[str]:
+    """Expand a directory, glob pattern or single file into a sorted list of files"""
+    if os.path.isdir(source):
+        paths = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(source)
+            for name in names
+        ]
+    elif os.path.isfile(source):
+        paths = [source]
+    else:
+        paths = [path for path in glob.glob(source, recursive=True) if os.path.isfile(path)]
+    return sorted(paths)
+
+
+def tokenize_corpus(source: str, model: str, workers: Optional[int] = None,
+                    text_field: str = "text", chunksize: int = 4, bundle_dir: Optional[str] = None) -> Dict:
+    """Count tokens for every file in a corpus; returns per-file and aggregate counts
+
+    Files that can't be read or decoded are recorded with an "error" and
+    left out of the totals. JSONL records that can't be tokenized are
+    counted as "skipped_records" and left out of the document and token
+    totals.
+    """
+    # Fail once here, with the usual message, rather than in every worker
+    with redirect_stdout(sys.stderr):
+        TokenizerApp(bundle_dir=bundle_dir).load_tokenizer(model)
+
+    paths = resolve_inputs(source)
+    jsonl_paths = [path for path in paths if path.endswith(".jsonl")]
+    text_paths = [path for path in paths if not path.endswith(".jsonl")]
+
+    files = {path: {"documents": 0, "tokens": 0, "skipped_records": 0} for path in paths}
+    shards = [shard for path in jsonl_paths for shard in _jsonl_shards(path, text_field)]
+
+    with Pool(processes=workers, initializer=_init_worker, initargs=(model, bundle_dir)) as pool:
+        results = [
+            pool.imap_unordered(_count_file_task, text_paths, chunksize=chunksize),
+            pool.imap_unordered(_count_jsonl_task, shards, chunksize=chunksize),
+        ]
+        for result in results:
+            for path, documents, tokens, skipped, error in result:
+                files[path]["documents"] += documents
+                files[path]["tokens"] += tokens
+                files[path]["skipped_records"] += skipped
+                if error is not None:
+                    files[path]["error"] = error
+
+    return {
+        "model": model,
+        "files": files,
+        "total_files": len(files),
+        "failed_files": sum("error" in entry for entry in files.values()),
+        "total_documents": sum(entry["documents"] for entry in files.values()),
+        "skipped_records": sum(entry["skipped_records"] for entry in files.values()),
+        "total_tokens": sum(entry["tokens"] for entry in files.values()),
+    }
+
+
+def display_corpus_results(results: Dict, as_json: bool = False) -> None:
+    """Print per-file and aggregate corpus counts"""
+    if as_json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"\n--- Corpus Tokenization Results for {results['model']} ---")
+    for path, entry in results["files"].items():
+        if "error" in entry:
+            print(f"{'skipped':>14}  {path}  ({entry['error']})")
+        elif entry["skipped_records"]:
+            print(f"{entry['tokens']:>14,}  {path}  ({entry['documents']:,} documents, "
+                  f"{entry['skipped_records']:,} records skipped)")
+        else:
+            print(f"{entry['tokens']:>14,}  {path}  ({entry['documents']:,} documents)")
+    print(f"Files: {results['total_files']:,}")
+    if results["failed_files"]:
+        print(f"Skipped (unreadable): {results['failed_files']:,}")
+    print(f"Documents: {results['total_documents']:,}")
+    if results["skipped_records"]:
+        print(f"Skipped records (could not be tokenized): {results['skipped_records']:,}")
+    print(f"Total tokens: {results['total_tokens']:,}")
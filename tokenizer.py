@@ -5,12 +5,124 @@ Tokenizer CLI - A command-line tool for tokenizing text for various LLM models
 
 
 import argparse
+import atexit
+import codecs
+import os
 import sys
 import json
-from typing import Dict, List, Tuple, Optional, Union
-import tiktoken
-from transformers import AutoTokenizer
-import anthropic
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple, Optional, Union
+from cost_estimator import PRICING
+from token_cache import DEFAULT_CACHE_PATH, TokenCountCache
+from tokenizer_bundle import export_bundle, load_bundled_tokenizer
+from tokenizer_registry import TokenizerRegistry, current_rss
+
+
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MiB of input per streamed chunk
+
+# Where tokenizer_server listens by default; defined here so the CLI can parse
+# arguments without importing the (comparatively slow) http modules
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8765
+
+
+# tokenizers pipeline components that act on each pre-token independently, so
+# the boundaries find_safe_split picks survive them. Anything else (e.g. the
+# SentencePiece-style Prepend("▁") normalizer or Metaspace) tokenizes a chunk
+# differently from the same text inside the whole document
+CHUNK_SAFE_NORMALIZERS = {"NFC", "NFD", "NFKC", "NFKD", "Lowercase"}
+CHUNK_SAFE_PRE_TOKENIZERS = {"ByteLevel", "Split", "Digits", "Punctuation", "Whitespace", "WhitespaceSplit"}
+# The whitespace alternative of the GPT-2 family's pre-tokenizer regexes (GPT-2, cl100k, Llama 3)
+GPT_WHITESPACE_PATTERN = r"\s+(?!\S)"
+
+
+def find_safe_split(text: str) -> int:
+    """Find the last index where text can be split without changing its tokenization
+
+    Regex pre-tokenizers (tiktoken, GPT-2-style byte-level BPE) never merge
+    across a single newline between non-whitespace, so that is preferred (a
+    run of newlines can pre-tokenize differently once it ends a chunk).
+    Failing that, split before a single space between two words.
+    Returns 0 when no safe point exists. Other pipelines give no such
+    guarantee; check TokenizerApp.supports_chunked_counting first.
+    """
+    pos = text.rfind("\n", 1, len(text) - 1)
+    while pos != -1:
+        if not text[pos - 1].isspace() and not text[pos + 1].isspace():
+            return pos + 1
+        pos = text.rfind("\n", 1, pos)
+
+    pos = text.rfind(" ", 1, len(text) - 1)
+    while pos != -1:
+        if not text[pos - 1].isspace() and not text[pos + 1].isspace():
+            return pos
+        pos = text.rfind(" ", 1, pos)
+
+    return 0
+
+
+def _pipeline_components(component, key: str) -> List[Dict]:
+    if component is None:
+        return []
+    state = json.loads(component.__getstate__())
+    return state[key] if state["type"] == "Sequence" else [state]
+
+
+def _splits_on_whitespace(pre_tokenizer: Dict) -> bool:
+    """Whether a pre-tokenizer separates words at the spaces and newlines find_safe_split cuts at"""
+    kind = pre_tokenizer["type"]
+    if kind in ("Whitespace", "WhitespaceSplit"):
+        return True
+    if kind == "ByteLevel":
+        return pre_tokenizer.get("use_regex", True)
+    if kind == "Split":
+        return GPT_WHITESPACE_PATTERN in pre_tokenizer["pattern"].get("Regex", "")
+    return False
+
+
+def is_chunk_safe_pipeline(backend) -> bool:
+    """Whether a tokenizers.Tokenizer splits text like a regex pre-tokenizer, so find_safe_split holds"""
+    normalizers = _pipeline_components(backend.normalizer, "normalizers")
+    pre_tokenizers = _pipeline_components(backend.pre_tokenizer, "pretokenizers")
+    if not pre_tokenizers:
+        return False  # The model sees the whole text at once
+    if any(normalizer["type"] not in CHUNK_SAFE_NORMALIZERS for normalizer in normalizers):
+        return False
+    for pre_tokenizer in pre_tokenizers:
+        if pre_tokenizer["type"] not in CHUNK_SAFE_PRE_TOKENIZERS:
+            return False
+        if pre_tokenizer["type"] == "ByteLevel" and pre_tokenizer.get("add_prefix_space"):
+            return False  # Every chunk would gain a leading space
+    # Digits, Punctuation and other Splits keep a space inside a pre-token, where BPE can merge across it
+    return any(_splits_on_whitespace(pre_tokenizer) for pre_tokenizer in pre_tokenizers)
+
+
+def iter_text_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[str, int]]:
+    """Yield (chunk, bytes_read) pairs from a UTF-8 file, split on safe boundaries"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    bytes_read = 0
+    pending = ""
+
+    with open(path, "rb") as f:
+        while True:
+            raw = f.read(chunk_size)
+            bytes_read += len(raw)
+            pending += decoder.decode(raw, final=not raw)
+
+            if not raw:
+                if pending:
+                    yield pending, bytes_read
+                return
+
+            split = find_safe_split(pending)
+            if split == 0:
+                if len(pending) < 4 * chunk_size:
+                    continue  # Keep reading until a safe boundary shows up
+                split = len(pending)  # No boundary at all, fall back to a hard split
+
+            yield pending[:split], bytes_read
+            pending = pending[split:]
 
 
 class TokenizerApp:
@@ -62,10 +174,40 @@ class TokenizerApp:
         }
     }
 
-    def __init__(self):
-        self.tokenizers = {}
+    CHAT_PRIMING_TOKENS = {
+        # Tokens added once per conversation by the chat template to prime the
+        # assistant's reply (e.g. <|im_start|>assistant for GPT, BOS plus the
+        # assistant header for Llama 3)
+        "gpt": 3,
+        "claude": 3,
+        "llama": 5,
+        "mistral": 2,
+        "grok": 3
+    }
+
+    MESSAGE_ROLES = {
+        # Role names used by other chat APIs (Gemini calls the assistant "model")
+        "model": "assistant",
+        "function": "assistant",
+        "tool": "assistant"
+    }
+
+    MESSAGE_CACHE_SIZE = 10000
+
+    def __init__(self, cache=None, memory_budget: Optional[int] = None, bundle_dir: Optional[str] = None,
+                 metrics=None, registry: Optional[TokenizerRegistry] = None):
+        # Pass a registry to share loaded tokenizers between apps (e.g. the server's per-model batchers)
+        if registry is None:
+            registry = TokenizerRegistry(self.SUPPORTED_MODELS, memory_budget=memory_budget)
+        self.tokenizers = registry
         self.current_model = None
         self.role = "user"  # Default role
+        self.cache = cache  # Optional TokenCountCache consulted by count_tokens/count_batch
+        self.bundle_dir = bundle_dir  # Optional offline bundle written by export-bundle
+        self.message_counts = OrderedDict()  # (encoding, role, content) -> tokens, for count_messages
+        self.metrics = metrics  # Optional instrumentation.Metrics; wraps the hot methods when set
+        if metrics is not None:
+            metrics.instrument(self)
 
     def _get_tokenizer_type(self, model: str) -> str:
         """Determine which tokenizer to use based on the model name"""
@@ -76,38 +218,72 @@ class TokenizerApp:
         else:
             return "transformers"
 
-    def load_tokenizer(self, model: str) -> None:
+    def load_tokenizer(self, model: str, make_current: bool = True) -> None:
         """Load the appropriate tokenizer for the specified model"""
-        self.current_model = model
-
         if model not in self.SUPPORTED_MODELS:
             print(f"Error: Model '{model}' is not supported")
             print(f"Supported models: {', '.join(self.SUPPORTED_MODELS.keys())}")
             sys.exit(1)
 
         if model in self.tokenizers:
-            return  # Tokenizer already loaded
+            self.tokenizers.touch(model)
+            if make_current:
+                self._set_current(model)
+            return  # Tokenizer already loaded (possibly shared with a model using the same encoding)
 
         tokenizer_type = self._get_tokenizer_type(model)
         
+        rss_before = current_rss()
+        
+        # Backends are imported on first use so that e.g. --list-models or a
+        # GPT-only run never pays for importing transformers/torch
         try:
-            if tokenizer_type == "tiktoken":
+            if self.bundle_dir:
+                self.tokenizers[model] = load_bundled_tokenizer(self.bundle_dir, self.SUPPORTED_MODELS[model], tokenizer_type)
+            
+            elif tokenizer_type == "tiktoken":
+                import tiktoken
                 encoding_name = self.SUPPORTED_MODELS[model]
                 self.tokenizers[model] = tiktoken.get_encoding(encoding_name)
             
             elif tokenizer_type == "anthropic":
+                import anthropic
                 self.tokenizers[model] = anthropic.Anthropic().get_tokenizer()
             
             elif tokenizer_type == "transformers":
+                from transformers import AutoTokenizer
                 model_name = self.SUPPORTED_MODELS[model]
                 self.tokenizers[model] = AutoTokenizer.from_pretrained(model_name)
             
             print(f"Successfully loaded tokenizer for {model}")
+            if make_current:
+                self._set_current(model)
+            
+            rss_after = current_rss()
+            measured = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            evicted_count = self.tokenizers.evictions
+            self.tokenizers.record_size(model, tokenizer_type, measured)
+            if self.tokenizers.evictions > evicted_count:
+                print(f"Evicted {self.tokenizers.evictions - evicted_count} unused tokenizer(s) to stay within the memory budget")
         
         except Exception as e:
             print(f"Error loading tokenizer for {model}: {str(e)}")
             sys.exit(1)
 
+    def _set_current(self, model: str) -> None:
+        """Switch to a loaded model, pinning it so loading others can't evict it"""
+        if model == self.current_model:
+            return
+        self.tokenizers.pin(model)
+        if self.current_model in self.SUPPORTED_MODELS:
+            self.tokenizers.unpin(self.current_model)
+        self.current_model = model
+
+    def preload(self, models: List[str]) -> None:
+        """Load tokenizers ahead of time without changing the current model"""
+        for model in models:
+            self.load_tokenizer(model, make_current=False)
+
     def set_role(self, role: str) -> None:
         """Set the message role (system, user, assistant)"""
         valid_roles = ["system", "user", "assistant"]
@@ -123,17 +299,53 @@ class TokenizerApp:
         model_family = self._get_model_family()
         return self.ROLE_TOKENS.get(model_family, {}).get(self.role, 0)
 
-    def _get_model_family(self) -> str:
-        """Get the model family for the current model"""
-        if self.current_model.startswith("gpt"):
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """Count tokens for a whole chat, including per-message and reply-priming template overhead
+
+        Per-message counts are memoized, so recounting a history that grew by
+        one turn only tokenizes the new message.
+        """
+        if not self.current_model or self.current_model not in self.tokenizers:
+            print("Error: No tokenizer loaded. Please select a model first.")
+            return 0
+
+        if not messages:
+            return 0
+
+        total = sum(self.count_message(message) for message in messages)
+        return total + self.CHAT_PRIMING_TOKENS.get(self._get_model_family(), 0)
+
+    def count_message(self, message: Dict[str, str]) -> int:
+        """Count one chat message: its content plus the template tokens for its role"""
+        role = self.MESSAGE_ROLES.get(message.get("role", "user"), message.get("role", "user"))
+        content = message.get("content") or ""
+        key = (self.SUPPORTED_MODELS[self.current_model], role, content)
+
+        token_count = self.message_counts.get(key)
+        if token_count is not None:
+            self.message_counts.move_to_end(key)
+            return token_count
+
+        model_family = self._get_model_family()
+        token_count = self.count_tokens(content) + self.ROLE_TOKENS.get(model_family, {}).get(role, 0)
+
+        self.message_counts[key] = token_count
+        if len(self.message_counts) > self.MESSAGE_CACHE_SIZE:
+            self.message_counts.popitem(last=False)
+        return token_count
+
+    def _get_model_family(self, model: Optional[str] = None) -> str:
+        """Get the model family for the given model (default: the current model)"""
+        model = model or self.current_model
+        if model.startswith("gpt"):
             return "gpt"
-        elif self.current_model.startswith("claude"):
+        elif model.startswith("claude"):
             return "claude"
-        elif self.current_model.startswith("llama"):
+        elif model.startswith("llama"):
             return "llama"
-        elif self.current_model.startswith("mistral"):
+        elif model.startswith("mistral"):
             return "mistral"
-        elif self.current_model.startswith("grok"):
+        elif model.startswith("grok"):
             return "grok"
         return "unknown"
 
@@ -164,27 +376,237 @@ class TokenizerApp:
             print(f"Error during tokenization: {str(e)}")
             return [], 0
 
-    def display_tokens(self, tokens: List[int], token_count: int) -> None:
+    def tokenize_batch(self, texts: List[str], num_threads: int = 8) -> Tuple[List[List[int]], List[int]]:
+        """Tokenize many texts at once using each backend's native batch path"""
+        if not self.current_model or self.current_model not in self.tokenizers:
+            print("Error: No tokenizer loaded. Please select a model first.")
+            return [], []
+
+        if not texts:
+            return [], []
+
+        tokenizer = self.tokenizers[self.current_model]
+        tokenizer_type = self._get_tokenizer_type(self.current_model)
+
+        try:
+            if tokenizer_type == "tiktoken":
+                batch = tokenizer.encode_batch(texts, num_threads=num_threads)
+
+            elif tokenizer_type == "anthropic":
+                encodings = tokenizer.encode_batch(texts)
+                batch = [list(range(len(encoding.tokens))) for encoding in encodings]  # Indices, as in tokenize_text
+
+            elif tokenizer_type == "transformers":
+                # Plain lists straight from the fast tokenizer, no tensor round-trip
+                batch = tokenizer(texts)["input_ids"]
+
+            return batch, [len(tokens) for tokens in batch]
+
+        except Exception as e:
+            print(f"Error during batch tokenization: {str(e)}")
+            return [], []
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens for the given text without building a token list"""
+        if not self.current_model or self.current_model not in self.tokenizers:
+            print("Error: No tokenizer loaded. Please select a model first.")
+            return 0
+
+        tokenizer = self.tokenizers[self.current_model]
+        tokenizer_type = self._get_tokenizer_type(self.current_model)
+
+        encoding_name = self.SUPPORTED_MODELS[self.current_model]
+        if self.cache is not None:
+            cached = self.cache.get(encoding_name, text)
+            if cached is not None:
+                return cached
+
+        try:
+            token_count = self._count_with(tokenizer, tokenizer_type, text)
+
+        except Exception as e:
+            print(f"Error during token counting: {str(e)}")
+            return 0
+
+        if self.cache is not None:
+            self.cache.put(encoding_name, text, token_count)
+        return token_count
+
+    def count_batch(self, texts: List[str], num_threads: int = 8) -> List[int]:
+        """Count tokens for many texts without building token lists"""
+        if not self.current_model or self.current_model not in self.tokenizers:
+            print("Error: No tokenizer loaded. Please select a model first.")
+            return []
+
+        if not texts:
+            return []
+
+        if self.cache is None:
+            return self._count_batch_uncached(texts, num_threads)
+
+        encoding_name = self.SUPPORTED_MODELS[self.current_model]
+        counts = self.cache.get_many(encoding_name, texts)
+        missing = [i for i, count in enumerate(counts) if count is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            missing_counts = self._count_batch_uncached(missing_texts, num_threads)
+            if len(missing_counts) != len(missing_texts):
+                return []  # Counting failed and was already reported
+            for i, count in zip(missing, missing_counts):
+                counts[i] = count
+            self.cache.put_many(encoding_name, missing_texts, missing_counts)
+        return counts
+
+    def _count_batch_uncached(self, texts: List[str], num_threads: int) -> List[int]:
+        """Count tokens for many texts with the current backend, bypassing the cache"""
+        tokenizer = self.tokenizers[self.current_model]
+        tokenizer_type = self._get_tokenizer_type(self.current_model)
+
+        try:
+            if tokenizer_type == "anthropic":
+                return [len(encoding) for encoding in tokenizer.encode_batch(texts)]
+
+            if tokenizer_type == "transformers" and tokenizer.is_fast:
+                encodings = tokenizer.backend_tokenizer.encode_batch(texts, add_special_tokens=True)
+                return [len(encoding) for encoding in encodings]
+
+            with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                return list(executor.map(lambda text: self._count_with(tokenizer, tokenizer_type, text), texts))
+
+        except Exception as e:
+            print(f"Error during batch token counting: {str(e)}")
+            return []
+
+    def _count_with(self, tokenizer, tokenizer_type: str, text: str, add_special_tokens: bool = True) -> int:
+        """Count tokens with a specific backend, avoiding per-token Python ints"""
+        if tokenizer_type == "tiktoken":
+            # uint32 buffer instead of a List[int]
+            return len(tokenizer.encode_to_numpy(text))
+
+        elif tokenizer_type == "anthropic":
+            return len(tokenizer.encode(text))
+
+        elif tokenizer_type == "transformers":
+            if tokenizer.is_fast:
+                return len(tokenizer.backend_tokenizer.encode(text, add_special_tokens=add_special_tokens))
+            return len(tokenizer(text, add_special_tokens=add_special_tokens)["input_ids"])
+
+        return 0
+
+    def encode_array(self, text: str):
+        """Tokenize text into a contiguous uint32 NumPy array"""
+        flat, _ = self.encode_batch_array([text])
+        return flat
+
+    def encode_batch_array(self, texts: List[str], num_threads: int = 8):
+        """Tokenize many texts into one flat uint32 array plus int64 offsets (len(texts) + 1)
+
+        Tokens for texts[i] are flat[offsets[i]:offsets[i + 1]].
+        """
+        import numpy as np
+
+        if not self.current_model or self.current_model not in self.tokenizers:
+            print("Error: No tokenizer loaded. Please select a model first.")
+            return np.empty(0, dtype=np.uint32), np.zeros(1, dtype=np.int64)
+
+        tokenizer = self.tokenizers[self.current_model]
+        tokenizer_type = self._get_tokenizer_type(self.current_model)
+
+        try:
+            if tokenizer_type == "tiktoken":
+                # encode_to_numpy hands back uint32 buffers directly, no Python ints per token
+                with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                    arrays = list(executor.map(tokenizer.encode_to_numpy, texts))
+
+            elif tokenizer_type == "anthropic":
+                # Anthropic doesn't expose token IDs, using indices as in tokenize_text
+                arrays = [np.arange(len(encoding), dtype=np.uint32) for encoding in tokenizer.encode_batch(texts)]
+
+            elif tokenizer_type == "transformers":
+                if tokenizer.is_fast:
+                    ids = [encoding.ids for encoding in tokenizer.backend_tokenizer.encode_batch(texts, add_special_tokens=True)]
+                else:
+                    ids = tokenizer(texts)["input_ids"]
+                arrays = [np.asarray(token_ids, dtype=np.uint32) for token_ids in ids]
+
+            offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+            np.cumsum([len(array) for array in arrays], out=offsets[1:])
+            flat = np.concatenate(arrays).astype(np.uint32, copy=False) if arrays else np.empty(0, dtype=np.uint32)
+            return flat, offsets
+
+        except Exception as e:
+            print(f"Error during array tokenization: {str(e)}")
+            return np.empty(0, dtype=np.uint32), np.zeros(1, dtype=np.int64)
+
+    def supports_chunked_counting(self) -> bool:
+        """Whether the current tokenizer gives the same total for text split by find_safe_split"""
+        tokenizer = self.tokenizers[self.current_model]
+        tokenizer_type = self._get_tokenizer_type(self.current_model)
+        if tokenizer_type == "tiktoken":
+            return True
+
+        try:
+            backend = tokenizer.backend_tokenizer if tokenizer_type == "transformers" else tokenizer
+            return is_chunk_safe_pipeline(backend)
+        except (AttributeError, KeyError, ValueError):
+            return False  # Slow tokenizers and backends we can't inspect are counted in one pass
+
+    def count_file(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, show_progress: bool = True) -> int:
+        """Count tokens in a file of any size by streaming it in bounded chunks
+
+        Tokenizers whose pipeline doesn't keep chunk boundaries (see
+        supports_chunked_counting) read the file in one pass instead.
+        """
+        if not self.current_model or self.current_model not in self.tokenizers:
+            print("Error: No tokenizer loaded. Please select a model first.")
+            return 0
+
+        tokenizer = self.tokenizers[self.current_model]
+        tokenizer_type = self._get_tokenizer_type(self.current_model)
+        total_bytes = os.path.getsize(path)
+
+        if not self.supports_chunked_counting():
+            with open(path, 'r', encoding='utf-8') as f:
+                token_count = self._count_with(tokenizer, tokenizer_type, f.read())
+            if show_progress:
+                print(f"{total_bytes:,}/{total_bytes:,} bytes (100.0%) - {token_count:,} tokens", file=sys.stderr)
+            return token_count
+
+        token_count = 0
+
+        # Special tokens (e.g. BOS) are added once for the whole file, not per chunk
+        if tokenizer_type == "transformers":
+            token_count += tokenizer.num_special_tokens_to_add()
+
+        for chunk, bytes_read in iter_text_chunks(path, chunk_size):
+            token_count += self._count_with(tokenizer, tokenizer_type, chunk, add_special_tokens=False)
+            if show_progress:
+                percent = 100 * bytes_read / total_bytes if total_bytes else 100
+                print(f"\r{bytes_read:,}/{total_bytes:,} bytes ({percent:.1f}%) - {token_count:,} tokens",
+                      end="", file=sys.stderr, flush=True)
+
+        if show_progress:
+            print(file=sys.stderr)
+        return token_count
+
+    def display_tokens(self, tokens: Optional[List[int]], token_count: int) -> None:
         """Display the tokens and related information"""
-        model_family = self._get_model_family()
         role_tokens = self.get_role_token_count()
         
         print(f"\n--- Tokenization Results for {self.current_model} ({self.role} role) ---")
-        print(f"Raw tokens: {tokens}")
+        if tokens is not None:
+            print(f"Raw tokens: {tokens}")
         print(f"Token count: {token_count}")
         print(f"Role formatting tokens: ~{role_tokens}")
         print(f"Total tokens (text + role): ~{token_count + role_tokens}")
         
-        if model_family == "gpt":
-            pricing_info = {
-                "gpt-3.5-turbo": {"input": 0.0005, "output": 0.0015},
-                "gpt-4": {"input": 0.01, "output": 0.03},
-                "gpt-4-turbo": {"input": 0.01, "output": 0.03}
-            }
-            if self.current_model in pricing_info:
-                price_info = pricing_info[self.current_model]
-                estimated_cost = (token_count + role_tokens) * price_info["input"] / 1000
-                print(f"Estimated cost (as input): ${estimated_cost:.6f} USD")
+        if self.cache is not None and self.cache.lookups:
+            print(f"Token count cache hit rate: {self.cache.hit_rate:.1%}")
+        
+        if self.current_model in PRICING:
+            price_info = PRICING[self.current_model]
+            estimated_cost = (token_count + role_tokens) * price_info["input"] / 1000
+            print(f"Estimated cost (as input): ${estimated_cost:.6f} USD")
 
     def decode_tokens(self, tokens: List[int]) -> str:
         """Decode tokens back to text when possible"""
@@ -205,6 +627,33 @@ class TokenizerApp:
             return f"Error decoding tokens: {str(e)}"
 
 
+def run_with_server(app: TokenizerApp, client, args) -> None:
+    """Handle --text/--file through a running tokenizer server"""
+    app.current_model = args.model or "gpt-3.5-turbo"
+    if app.current_model not in app.SUPPORTED_MODELS:
+        print(f"Error: Model '{app.current_model}' is not supported")
+        sys.exit(1)
+    
+    if args.role:
+        app.set_role(args.role)
+    
+    try:
+        if args.file:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            text = args.text
+        
+        if args.count_only:
+            app.display_tokens(None, client.count(app.current_model, text))
+        else:
+            tokens, token_count = client.encode(app.current_model, text)
+            app.display_tokens(tokens, token_count)
+    except Exception as e:
+        print(f"Error from tokenizer server: {str(e)}")
+        sys.exit(1)
+
+
 def main():
     """Main function to run the tokenizer CLI"""
     parser = argparse.ArgumentParser(description="Tokenizer CLI - A tool for tokenizing text for various LLM models")
@@ -224,9 +673,119 @@ def main():
     parser.add_argument("--text", "-t", type=str,
                         help="Text to tokenize (alternative to interactive mode)")
     
+    parser.add_argument("--count-only", "-c", action="store_true",
+                        help="Only report token counts, without building token lists")
+    
+    parser.add_argument("--stream", "-s", action="store_true",
+                        help="Stream --file in bounded chunks and report running token totals")
+    
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH, default=None, metavar="PATH",
+                        help="Cache token counts on disk for --text/--file with --count-only, and serve "
+                             "(default path: %(const)s)")
+    
+    parser.add_argument("--server", type=str, default=f"{DEFAULT_SERVER_HOST}:{DEFAULT_SERVER_PORT}", metavar="HOST:PORT",
+                        help="Tokenizer server used for --text/--file when it is running")
+    
+    parser.add_argument("--socket", type=str, default=None, metavar="PATH",
+                        help="Unix socket of the tokenizer server (instead of --server)")
+    
+    parser.add_argument("--no-server", action="store_true",
+                        help="Always tokenize in-process, even if a server is running")
+    
+    parser.add_argument("--preload", nargs="*", default=[], metavar="MODEL",
+                        help="Load these models' tokenizers at startup (useful in interactive mode)")
+    
+    parser.add_argument("--memory-budget", type=int, default=None, metavar="MB",
+                        help="Evict least recently used tokenizers above this many MB")
+    
+    parser.add_argument("--bundle", type=str, default=None, metavar="DIR",
+                        help="Load tokenizers from an offline bundle created with export-bundle")
+    
+    parser.add_argument("--npy", type=str, default=None, metavar="PREFIX",
+                        help="Write uint32 token arrays to PREFIX.tokens.npy/PREFIX.offsets.npy "
+                             "(--file: one document per line)")
+    
+    parser.add_argument("--metrics", type=str, default=None, metavar="PATH",
+                        help="Record call counts, bytes, tokens and latency histograms and write them to PATH on exit")
+    
+    parser.add_argument("--metrics-format", type=str, choices=["json", "prometheus"], default="json",
+                        help="Format for --metrics")
+    
+    parser.add_argument("--profile", action="store_true",
+                        help="Run under cProfile and tracemalloc and print a report to stderr")
+    
+    parser.add_argument("--profile-output", type=str, default=None, metavar="PATH",
+                        help="Also save raw cProfile data for --profile (readable with pstats/snakeviz)")
+    
+    subparsers = parser.add_subparsers(dest="command")
+    
+    corpus_parser = subparsers.add_parser("tokenize-corpus",
+                                          help="Count tokens for a directory, glob or JSONL file using a process pool")
+    corpus_parser.add_argument("source", type=str,
+                               help="Directory, glob pattern or JSONL file to tokenize")
+    corpus_parser.add_argument("--model", "-m", type=str, default=argparse.SUPPRESS,
+                               help="Select the model to use for tokenization")
+    corpus_parser.add_argument("--workers", "-w", type=int, default=None,
+                               help="Number of worker processes (default: all cores)")
+    corpus_parser.add_argument("--text-field", type=str, default="text",
+                               help="Field holding the text in JSONL records")
+    corpus_parser.add_argument("--json", action="store_true",
+                               help="Print results as JSON")
+    
+    serve_parser = subparsers.add_parser("serve",
+                                         help="Keep tokenizers warm and serve count/encode/decode requests")
+    serve_parser.add_argument("--host", type=str, default=DEFAULT_SERVER_HOST,
+                              help="Address to listen on")
+    serve_parser.add_argument("--port", "-p", type=int, default=DEFAULT_SERVER_PORT,
+                              help="Port to listen on")
+    serve_parser.add_argument("--socket", type=str, default=argparse.SUPPRESS, metavar="PATH",
+                              help="Listen on a Unix socket instead of TCP")
+    serve_parser.add_argument("--preload", nargs="*", default=argparse.SUPPRESS, metavar="MODEL",
+                              help="Models whose tokenizers are loaded at startup")
+    
+    bundle_parser = subparsers.add_parser("export-bundle",
+                                          help="Save every supported tokenizer to a directory for offline loading")
+    bundle_parser.add_argument("directory", type=str,
+                               help="Directory to write the bundle to")
+    
+    cost_parser = subparsers.add_parser("estimate-costs",
+                                        help="Price a JSONL file of {model, input_tokens, output_tokens} records")
+    cost_parser.add_argument("usage_file", type=str,
+                             help="JSONL usage records to price")
+    cost_parser.add_argument("--role", "-r", type=str, choices=["system", "user", "assistant"],
+                             default=argparse.SUPPRESS, help="Role whose formatting overhead is added per request")
+    cost_parser.add_argument("--json", action="store_true",
+                             help="Print the report as JSON")
+    
     args = parser.parse_args()
     
-    app = TokenizerApp()
+    # The cache holds whole-text token counts; only --count-only and serve consult it
+    if args.cache and not args.list_models:
+        unsupported = None
+        if args.command and args.command != "serve":
+            unsupported = args.command
+        elif not args.command and not (args.text or args.file):
+            unsupported = "interactive mode"
+        elif not args.command and (args.stream or args.npy):
+            unsupported = "--stream" if args.stream else "--npy"
+        if unsupported:
+            print(f"Error: --cache is not supported with {unsupported}")
+            sys.exit(1)
+        if not args.command and not args.count_only:
+            print("Error: --cache only applies to token counts; add --count-only")
+            sys.exit(1)
+    
+    memory_budget = args.memory_budget << 20 if args.memory_budget else None
+    metrics = None
+    if args.metrics:
+        from instrumentation import Metrics
+        metrics = Metrics()
+        atexit.register(metrics.write, args.metrics, args.metrics_format)
+    
+    app = TokenizerApp(cache=TokenCountCache(args.cache) if args.cache else None, memory_budget=memory_budget,
+                       bundle_dir=args.bundle, metrics=metrics)
+    if app.cache is not None:
+        atexit.register(app.cache.close)
     
     # Handle listing models
     if args.list_models:
@@ -235,6 +794,57 @@ def main():
             print(f"  - {model}")
         return
     
+    # Corpus tokenization runs in worker processes, each loading its own tokenizer
+    if args.command == "tokenize-corpus":
+        from tokenize_corpus import tokenize_corpus, display_corpus_results
+        
+        model = args.model or "gpt-3.5-turbo"
+        if model not in app.SUPPORTED_MODELS:
+            print(f"Error: Model '{model}' is not supported")
+            sys.exit(1)
+        
+        results = tokenize_corpus(args.source, model, workers=args.workers, text_field=args.text_field,
+                                  bundle_dir=args.bundle)
+        display_corpus_results(results, as_json=args.json)
+        return
+    
+    if args.command == "serve":
+        from tokenizer_server import serve
+        
+        serve(host=args.host, port=args.port, socket_path=args.socket, preload=args.preload, cache=app.cache,
+              bundle_dir=args.bundle, metrics=metrics, memory_budget=memory_budget)
+        return
+    
+    if args.command == "export-bundle":
+        export_bundle(app, args.directory)
+        return
+    
+    if args.command == "estimate-costs":
+        from cost_estimator import CostEstimator, display_cost_summary, load_requests
+        
+        try:
+            with open(args.usage_file, 'r', encoding='utf-8') as f:
+                summary = CostEstimator(app).summarize(load_requests(f), role=args.role or "user")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error estimating costs: {str(e)}")
+            sys.exit(1)
+        
+        if args.json:
+            print(json.dumps(summary, indent=2))
+        else:
+            display_cost_summary(summary)
+        return
+    
+    # One-shot requests go to a running server, which already has the tokenizer loaded; --cache counts locally
+    if (args.text or args.file) and not args.stream and not args.npy and not args.no_server and not args.cache:
+        host, _, port = args.server.rpartition(":")
+        from tokenizer_server import TokenizerClient
+        
+        client = TokenizerClient(host or DEFAULT_SERVER_HOST, int(port), socket_path=args.socket)
+        if client.is_running():
+            run_with_server(app, client, args)
+            return
+    
     # Set model if provided
     if args.model:
         app.load_tokenizer(args.model)
@@ -242,17 +852,45 @@ def main():
         # Default model if none provided
         app.load_tokenizer("gpt-3.5-turbo")
     
+    if args.preload:
+        app.preload(args.preload)
+    
     # Set role if provided
     if args.role:
         app.set_role(args.role)
     
+    # Write token arrays for ML preprocessing instead of displaying tokens
+    if args.npy and (args.file or args.text):
+        from token_arrays import write_token_arrays
+        
+        try:
+            if args.file:
+                with open(args.file, 'r', encoding='utf-8') as f:
+                    documents, token_count = write_token_arrays(app, (line.rstrip("\n") for line in f), args.npy)
+            else:
+                documents, token_count = write_token_arrays(app, [args.text], args.npy)
+        except Exception as e:
+            print(f"Error writing token arrays: {str(e)}")
+            sys.exit(1)
+        
+        print(f"Wrote {token_count:,} tokens for {documents:,} documents to {args.npy}.tokens.npy "
+              f"(offsets in {args.npy}.offsets.npy)")
+        return
+    
     # Process text from file if provided
     if args.file:
         try:
+            if args.stream:
+                app.display_tokens(None, app.count_file(args.file))
+                return
+
             with open(args.file, 'r', encoding='utf-8') as f:
                 text = f.read()
-            tokens, token_count = app.tokenize_text(text)
-            app.display_tokens(tokens, token_count)
+            if args.count_only:
+                app.display_tokens(None, app.count_tokens(text))
+            else:
+                tokens, token_count = app.tokenize_text(text)
+                app.display_tokens(tokens, token_count)
             return
         except Exception as e:
             print(f"Error reading file: {str(e)}")
@@ -260,8 +898,11 @@ def main():
     
     # Process text from command line argument if provided
     if args.text:
-        tokens, token_count = app.tokenize_text(args.text)
-        app.display_tokens(tokens, token_count)
+        if args.count_only:
+            app.display_tokens(None, app.count_tokens(args.text))
+        else:
+            tokens, token_count = app.tokenize_text(args.text)
+            app.display_tokens(tokens, token_count)
         return
     
     # Interactive mode
@@ -273,6 +914,8 @@ Type 'help' for commands or start typing text to tokenize.
 Type 'exit' or Ctrl+D to quit.
 =============================""")
     
+    document = None  # IncrementalTokenizer for the ':doc' and ':+' commands
+    
     while True:
         try:
             user_input = input("\n> ")
@@ -288,9 +931,40 @@ Commands:
   list models           - List all supported models
   clear                 - Clear the screen
   exit                  - Exit the program
+  :+ <text>             - Append a line to the working document and show its running token total
+  :doc <text>           - Replace the working document (only the changed region is re-tokenized)
+  :doc load <path>      - Load a file as the working document
+  :doc                  - Show the working document's token total
+  :doc clear            - Empty the working document
   <text>                - Tokenize the entered text
                 """)
             
+            # The ':' prefix keeps text such as "+1 555 0100" or "doc strings..." tokenizable
+            elif user_input.startswith(":+") or user_input.lower() == ":doc" or user_input.lower().startswith(":doc "):
+                from incremental import IncrementalTokenizer
+                
+                # Token counts depend on the tokenizer, so start over after a model change
+                if document is None or document.model != app.current_model:
+                    document = IncrementalTokenizer(app, document.text if document else "")
+                
+                if user_input.startswith(":+"):
+                    line = user_input[2:].strip()
+                    document.append(f"\n{line}" if document.text else line)
+                elif user_input.lower() == ":doc clear":
+                    document.set_text("")
+                elif user_input.lower().startswith(":doc load "):
+                    try:
+                        with open(user_input[10:].strip(), 'r', encoding='utf-8') as f:
+                            document.set_text(f.read())
+                    except (OSError, UnicodeDecodeError) as e:
+                        print(f"Error reading file: {str(e)}")
+                        continue
+                elif user_input.lower().startswith(":doc "):
+                    document.set_text(user_input[5:])
+                
+                print(f"Document: {len(document.text):,} chars, {document.token_count:,} tokens "
+                      f"(re-tokenized {document.last_recounted} of {len(document.segments)} segments)")
+            
             elif user_input.lower().startswith("model "):
                 model_name = user_input[6:].strip()
                 app.load_tokenizer(model_name)
@@ -312,8 +986,9 @@ Commands:
                 tokens, token_count = app.tokenize_text(user_input)
                 app.display_tokens(tokens, token_count)
                 
-                # Show decoded tokens when possible
-                if tokens:
+                # Show decoded tokens when possible. tiktoken round-trips exactly,
+                # so only the transformers backend can differ from the input
+                if tokens and app._get_tokenizer_type(app.current_model) == "transformers":
                     decoded = app.decode_tokens(tokens)
                     if decoded and decoded != user_input:
                         print(f"\nDecoded text: {decoded}")
@@ -328,7 +1003,13 @@ Commands:
 
 if __name__ == "__main__":
     try:
-        main()
+        if "--profile" in sys.argv:
+            from instrumentation import run_profiled
+            
+            output = sys.argv[sys.argv.index("--profile-output") + 1] if "--profile-output" in sys.argv else None
+            run_profiled(main, output=output)
+        else:
+            main()
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+Tokenizer bundle - exports every supported tokenizer to one local directory and loads
+them back without touching the network or the Hugging Face hub
+"""
+
+
+import base64
+import io
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from typing import Dict
+
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _entry_dir(encoding_name: str) -> str:
+    """Directory name for an encoding inside the bundle"""
+    return encoding_name.replace("/", "--")
+
+
+def _write_tiktoken(encoding, directory: str) -> None:
+    """Write BPE ranks in tiktoken's own format, plus the regex and special tokens"""
+    with open(os.path.join(directory, "ranks.tiktoken"), "wb") as f:
+        for token, rank in sorted(encoding._mergeable_ranks.items(), key=lambda item: item[1]):
+            f.write(base64.b64encode(token) + b" " + str(rank).encode() + b"\n")
+
+    with open(os.path.join(directory, "encoding.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "name": encoding.name,
+            "pat_str": encoding._pat_str,
+            "special_tokens": encoding._special_tokens,
+        }, f)
+
+
+def _read_tiktoken(directory: str):
+    """Rebuild a tiktoken Encoding from bundle files"""
+    import tiktoken
+
+    with open(os.path.join(directory, "encoding.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+
+    mergeable_ranks = {}
+    with open(os.path.join(directory, "ranks.tiktoken"), "rb") as f:
+        for line in f:
+            if line.strip():
+                token, rank = line.split()
+                mergeable_ranks[base64.b64decode(token)] = int(rank)
+
+    return tiktoken.Encoding(
+        name=meta["name"],
+        pat_str=meta["pat_str"],
+        mergeable_ranks=mergeable_ranks,
+        special_tokens=meta["special_tokens"],
+    )
+
+
+def _write_manifest(directory: str, manifest: Dict[str, Dict[str, str]]) -> None:
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def export_bundle(app, directory: str) -> Dict[str, Dict[str, str]]:
+    """Load every supported tokenizer once and serialize it into directory
+
+    A backend that can't be loaded or saved is skipped with a warning. The
+    manifest is rewritten after each export, so the bundle always loads
+    whatever was exported.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = {}
+    skipped = []
+
+    for model, encoding_name in app.SUPPORTED_MODELS.items():
+        if encoding_name in manifest or encoding_name in skipped:
+            continue  # Already handled for another model sharing this encoding
+
+        tokenizer_type = app._get_tokenizer_type(model)
+        entry = _entry_dir(encoding_name)
+        entry_path = os.path.join(directory, entry)
+
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output):
+                app.load_tokenizer(model, make_current=False)
+            tokenizer = app.tokenizers[model]
+
+            os.makedirs(entry_path, exist_ok=True)
+            if tokenizer_type == "tiktoken":
+                _write_tiktoken(tokenizer, entry_path)
+            elif tokenizer_type == "anthropic":
+                tokenizer.save(os.path.join(entry_path, "tokenizer.json"))
+            elif tokenizer_type == "transformers":
+                tokenizer.save_pretrained(entry_path)
+        except (SystemExit, Exception) as e:
+            # load_tokenizer reports its own failure and exits
+            reason = output.getvalue().strip().splitlines()[-1:] or [str(e)]
+            print(f"Warning: skipped {encoding_name} ({model}): {reason[0]}")
+            skipped.append(encoding_name)
+            continue
+
+        manifest[encoding_name] = {"type": tokenizer_type, "path": entry}
+        _write_manifest(directory, manifest)
+        print(f"Exported {encoding_name} to {entry_path}")
+
+    if not manifest:
+        print("Error: No tokenizers could be exported")
+        sys.exit(1)
+    if skipped:
+        print(f"Bundle has {len(manifest)} of {len(manifest) + len(skipped)} encodings; "
+              f"models using {', '.join(skipped)} will not load from it")
+
+    return manifest
+
+
+def load_bundled_tokenizer(directory: str, encoding_name: str, tokenizer_type: str):
+    """Load one tokenizer from a bundle directory, never going to the network"""
+    with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if encoding_name not in manifest:
+        raise FileNotFoundError(f"'{encoding_name}' is not in the bundle at {directory}")
+
+    entry_path = os.path.join(directory, manifest[encoding_name]["path"])
+
+    if tokenizer_type == "tiktoken":
+        return _read_tiktoken(entry_path)
+
+    elif tokenizer_type == "anthropic":
+        from tokenizers import Tokenizer
+        return Tokenizer.from_file(os.path.join(entry_path, "tokenizer.json"))
+
+    elif tokenizer_type == "transformers":
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(entry_path, local_files_only=True)
+
+    raise ValueError(f"Unknown tokenizer type '{tokenizer_type}'")
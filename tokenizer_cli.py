@@ -2,9 +2,6 @@ import argparse
 import sys
 import json
 from typing import Dict, List, Tuple, Optional, Union
-import tiktoken
-from transformers import AutoTokenizer
-import anthropic
 
 class TokenizerApp:
 
@@ -79,15 +76,19 @@ class TokenizerApp:
          
          tokenizer_type = self._get_tokenizer_type(model)
 
+         # Import backends lazily so unused ones cost nothing at startup
          try: 
              if tokenizer_type == "tiktoken":
+                 import tiktoken
                  encoding_name = self.SUPPORTED_MODELS[model]
                  self.tokenizers[model] = tiktoken.get_encoding(encoding_name)
 
              elif tokenizer_type == "anthropic":
+                 import anthropic
                  self.tokenizers[model] = anthropic.Anthropic().get_tokenizer()
 
              elif tokenizer_type == "transformers":
+                 from transformers import AutoTokenizer
                  model_name = self.SUPPORTED_MODELS[model]
                  self.tokenizers[model] = AutoTokenizer.from_pretrained(model_name)
 
@@ -0,0 +1,120 @@
+"""
+Tokenizer registry - loaded tokenizers shared per encoding, with LRU eviction under a memory budget
+"""
+
+
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+
+# Fallback sizes when resident memory cannot be measured (e.g. not on Linux)
+ESTIMATED_SIZES = {
+    "tiktoken": 40 << 20,
+    "anthropic": 10 << 20,
+    "transformers": 200 << 20,
+}
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, or None if unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class TokenizerRegistry:
+    """Dict-like store of loaded tokenizers, keyed by model but shared per encoding
+
+    Models that map to the same SUPPORTED_MODELS value (e.g. every GPT model
+    uses cl100k_base) share one loaded tokenizer. When the estimated memory of
+    loaded tokenizers exceeds the budget, the least recently used ones are
+    dropped. The most recently used tokenizer and pinned ones (the model each
+    TokenizerApp sharing the registry is using) are never evicted.
+    """
+
+    def __init__(self, encodings: Dict[str, str], memory_budget: Optional[int] = None):
+        self.encodings = encodings
+        self.memory_budget = memory_budget
+        self.entries: "OrderedDict[str, object]" = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.pins: Counter = Counter()
+        self.evictions = 0
+        self.lock = threading.RLock()  # Apps in different threads (e.g. server batchers) may share one registry
+
+    def _key(self, model: str) -> str:
+        return self.encodings.get(model, model)
+
+    def __contains__(self, model: str) -> bool:
+        return self._key(model) in self.entries
+
+    def __getitem__(self, model: str):
+        key = self._key(model)
+        with self.lock:
+            tokenizer = self.entries[key]
+            self.entries.move_to_end(key)
+        return tokenizer
+
+    def __setitem__(self, model: str, tokenizer) -> None:
+        key = self._key(model)
+        with self.lock:
+            self.entries[key] = tokenizer
+            self.entries.move_to_end(key)
+
+    def touch(self, model: str) -> None:
+        """Mark a model's tokenizer as most recently used"""
+        with self.lock:
+            self.entries.move_to_end(self._key(model))
+
+    def pin(self, model: str) -> None:
+        """Keep a model's tokenizer loaded until it is unpinned as often as it was pinned"""
+        with self.lock:
+            self.pins[self._key(model)] += 1
+
+    def unpin(self, model: str) -> None:
+        with self.lock:
+            key = self._key(model)
+            self.pins[key] -= 1
+            if self.pins[key] <= 0:
+                del self.pins[key]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def record_size(self, model: str, tokenizer_type: str, measured: Optional[int]) -> None:
+        """Record how much memory a freshly loaded tokenizer took, then enforce the budget"""
+        key = self._key(model)
+        if measured is None or measured <= 0:
+            measured = ESTIMATED_SIZES.get(tokenizer_type, 0)
+        with self.lock:
+            self.sizes[key] = measured
+            self.evict()
+
+    def memory_used(self) -> int:
+        """Estimated bytes held by loaded tokenizers"""
+        return sum(self.sizes.get(key, 0) for key in self.entries)
+
+    def evict(self) -> List[str]:
+        """Drop least recently used, unpinned tokenizers until the budget is met"""
+        evicted = []
+        if self.memory_budget is None:
+            return evicted
+
+        with self.lock:
+            for key in list(self.entries)[:-1]:  # The most recently used entry is never evicted
+                if self.memory_used() <= self.memory_budget:
+                    break
+                if self.pins[key]:
+                    continue
+                del self.entries[key]
+                self.sizes.pop(key, None)
+                self.evictions += 1
+                evicted.append(key)
+        return evicted
+
+    def loaded(self) -> List[str]:
+        """Encodings currently loaded, least recently used first"""
+        return list(self.entries)
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Tokenizer server - keeps tokenizers warm and serves count/encode/decode over local HTTP
+"""
+
+
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+from concurrent.futures import Future
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from tokenizer import DEFAULT_SERVER_HOST as DEFAULT_HOST, DEFAULT_SERVER_PORT as DEFAULT_PORT, TokenizerApp
+from tokenizer_registry import TokenizerRegistry
+
+
+MAX_BATCH_SIZE = 256
+MAX_BATCH_DELAY = 0.002  # Seconds to wait for more requests before running a batch
+
+
+class MicroBatcher:
+    """Owns one TokenizerApp and coalesces concurrent requests into batches, reloading the tokenizer if it was evicted"""
+
+    def __init__(self, model: str, cache=None, bundle_dir: Optional[str] = None, metrics=None,
+                 registry: Optional[TokenizerRegistry] = None):
+        self.model = model
+        self.app = TokenizerApp(cache=cache, bundle_dir=bundle_dir, metrics=metrics, registry=registry)
+        with redirect_stdout(sys.stderr):
+            self.app.load_tokenizer(model, make_current=False)
+        # Not pinned while idle, so a memory budget can evict it; _run pins it for each batch
+        self.app.current_model = model
+        self.requests: "queue.Queue[Tuple[str, object, Future]]" = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name=f"batcher-{model}", daemon=True)
+        self.thread.start()
+
+    def submit(self, op: str, payload) -> Future:
+        """Queue a count/encode/decode request and return a future for its result"""
+        future = Future()
+        self.requests.put((op, payload, future))
+        return future
+
+    def _run(self) -> None:
+        """Drain the queue, grouping requests by operation"""
+        while True:
+            batch = [self.requests.get()]
+            try:
+                while len(batch) < MAX_BATCH_SIZE:
+                    batch.append(self.requests.get(timeout=MAX_BATCH_DELAY))
+            except queue.Empty:
+                pass
+
+            # Pinned while the batch runs, so loading another model can't evict this one mid-batch
+            registry = self.app.tokenizers
+            registry.pin(self.model)
+            try:
+                if not self._ensure_loaded():
+                    error = RuntimeError(f"Could not load tokenizer for {self.model}")
+                    for _, _, future in batch:
+                        future.set_exception(error)
+                    continue
+                for op in ("count", "encode", "decode"):
+                    items = [(payload, future) for item_op, payload, future in batch if item_op == op]
+                    if items:
+                        self._process(op, items)
+            finally:
+                registry.unpin(self.model)
+
+    def _ensure_loaded(self) -> bool:
+        """Reload the tokenizer if the memory budget evicted it while idle"""
+        if self.model in self.app.tokenizers:
+            return True
+        try:
+            with redirect_stdout(sys.stderr):
+                self.app.load_tokenizer(self.model, make_current=False)
+        except SystemExit:
+            return False
+        return True
+
+    def _run_texts(self, op: str, texts: List[str]) -> List:
+        if op == "count":
+            flat = self.app.count_batch(texts)
+        else:
+            flat = list(zip(*self.app.tokenize_batch(texts)))
+        if len(flat) != len(texts):
+            raise RuntimeError(f"{op} failed for {self.model}")
+        return flat
+
+    def _process(self, op: str, items: List[Tuple[object, Future]]) -> None:
+        """Run one micro-batch against the tokenizer and resolve its futures"""
+        if op == "decode":
+            for tokens, future in items:
+                try:
+                    future.set_result(self.app.decode_tokens(tokens))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        try:
+            # Flatten every request's texts into one backend call
+            flat = self._run_texts(op, [text for texts, _ in items for text in texts])
+        except Exception as e:
+            if len(items) == 1:
+                items[0][1].set_exception(e)
+                return
+            # Retry one request at a time so only the failing ones get the error
+            for item in items:
+                self._process(op, [item])
+            return
+
+        start = 0
+        for texts, future in items:
+            future.set_result(flat[start:start + len(texts)])
+            start += len(texts)
+
+
+class TokenizerService:
+    """Registry of per-model batchers shared by all request handlers"""
+
+    def __init__(self, preload: Optional[List[str]] = None, cache=None, bundle_dir: Optional[str] = None,
+                 metrics=None, memory_budget: Optional[int] = None):
+        self.cache = cache
+        self.bundle_dir = bundle_dir
+        self.metrics = metrics
+        # Shared by every batcher, so models with the same encoding (e.g. the GPT models) load it once,
+        # and the memory budget covers every loaded tokenizer
+        self.registry = TokenizerRegistry(TokenizerApp.SUPPORTED_MODELS, memory_budget=memory_budget)
+        self.batchers: Dict[str, MicroBatcher] = {}
+        self.loading: Dict[str, Future] = {}  # Models whose tokenizers are being loaded
+        self.lock = threading.Lock()
+        for model in preload or []:
+            self.get_batcher(model)
+
+    def get_batcher(self, model: str) -> MicroBatcher:
+        """Return the warm batcher for a model, loading its tokenizer on first use"""
+        if model not in TokenizerApp.SUPPORTED_MODELS:
+            raise ValueError(f"Model '{model}' is not supported")
+
+        with self.lock:
+            batcher = self.batchers.get(model)
+            if batcher is not None:
+                return batcher
+            loading = self.loading.get(model)
+            if loading is None:
+                loading = self.loading[model] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return loading.result()  # Another request is loading this model
+
+        # Loaded outside the lock, so requests for warm models aren't held up by a cold one
+        try:
+            batcher = MicroBatcher(model, cache=self.cache, bundle_dir=self.bundle_dir, metrics=self.metrics,
+                                   registry=self.registry)
+        except BaseException as e:
+            # Whatever failed, requests waiting on this load must not block forever
+            error = e if isinstance(e, Exception) else RuntimeError(f"Could not load tokenizer for {model}")
+            with self.lock:
+                del self.loading[model]  # The next request tries again
+            loading.set_exception(error)
+            if isinstance(e, SystemExit):
+                raise error from None
+            raise
+
+        with self.lock:
+            self.batchers[model] = batcher
+            del self.loading[model]
+        loading.set_result(batcher)
+        return batcher
+
+
+class TokenizerRequestHandler(BaseHTTPRequestHandler):
+    """JSON endpoints: GET /health, POST /count, /encode and /decode (plus GET /metrics when enabled)"""
+
+    service: TokenizerService = None
+
+    def log_message(self, format, *args):
+        pass  # Keep the server quiet; one line per request is too noisy at this volume
+
+    def address_string(self) -> str:
+        return self.client_address[0] if self.client_address else "unix"
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"status": "ok", "models": sorted(self.service.batchers)})
+        elif self.path == "/metrics" and self.service.metrics is not None:
+            data = self.service.metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._reply(404, {"error": "Not found"})
+
+    def do_POST(self):
+        op = self.path.strip("/")
+        if op not in ("count", "encode", "decode"):
+            self._reply(404, {"error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            batcher = self.service.get_batcher(request.get("model", "gpt-3.5-turbo"))
+
+            if op == "decode":
+                self._reply(200, {"text": batcher.submit("decode", request["tokens"]).result()})
+                return
+
+            single = "texts" not in request
+            texts = [request["text"]] if single else request["texts"]
+            # Checked here, so a bad request can't fail the batch it would have joined
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError("'text' must be a string and 'texts' a list of strings")
+            results = batcher.submit(op, texts).result()
+
+            if op == "count":
+                self._reply(200, {"count": results[0]} if single else {"counts": results})
+            else:
+                encoded = [{"tokens": list(tokens), "count": count} for tokens, count in results]
+                self._reply(200, encoded[0] if single else {"results": encoded})
+
+        except (KeyError, ValueError, TypeError) as e:
+            self._reply(400, {"error": str(e)})
+        except Exception as e:
+            self._reply(500, {"error": str(e)})
+
+    def _reply(self, status: int, body: Dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class TokenizerHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for bursts of clients"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP over a Unix domain socket"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: Optional[str] = None,
+          preload: Optional[List[str]] = None, cache=None, bundle_dir: Optional[str] = None,
+          metrics=None, memory_budget: Optional[int] = None) -> None:
+    """Run the tokenizer server until interrupted"""
+    service = TokenizerService(preload, cache, bundle_dir, metrics, memory_budget=memory_budget)
+    handler = type("Handler", (TokenizerRequestHandler,), {"service": service})
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, handler)
+        print(f"Tokenizer server listening on unix:{socket_path}")
+    else:
+        server = TokenizerHTTPServer((host, port), handler)
+        print(f"Tokenizer server listening on http://{host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that talks to a Unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class TokenizerClient:
+    """Thin client for a running tokenizer server"""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: Optional[str] = None,
+                 timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connection(self, timeout: float) -> http.client.HTTPConnection:
+        if self.socket_path:
+            return UnixHTTPConnection(self.socket_path, timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _request(self, method: str, path: str, body: Optional[Dict] = None, timeout: Optional[float] = None) -> Dict:
+        conn = self._connection(timeout or self.timeout)
+        try:
+            payload = json.dumps(body).encode("utf-8") if body is not None else None
+            conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            result = json.loads(response.read())
+            if response.status != 200:
+                raise RuntimeError(result.get("error", f"HTTP {response.status}"))
+            return result
+        finally:
+            conn.close()
+
+    def is_running(self) -> bool:
+        """Check, quickly, whether a server is accepting requests"""
+        if self.socket_path and not os.path.exists(self.socket_path):
+            return False
+        try:
+            return self._request("GET", "/health", timeout=0.2).get("status") == "ok"
+        except (OSError, ValueError, RuntimeError):
+            return False
+
+    def count(self, model: str, text: str) -> int:
+        return self._request("POST", "/count", {"model": model, "text": text})["count"]
+
+    def count_batch(self, model: str, texts: List[str]) -> List[int]:
+        return self._request("POST", "/count", {"model": model, "texts": texts})["counts"]
+
+    def encode(self, model: str, text: str) -> Tuple[List[int], int]:
+        result = self._request("POST", "/encode", {"model": model, "text": text})
+        return result["tokens"], result["count"]
+
+    def decode(self, model: str, tokens: List[int]) -> str:
+        return self._request("POST", "/decode", {"model": model, "tokens": tokens})["text"]
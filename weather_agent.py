@@ -1,25 +1,188 @@
-import json, os, requests
+import asyncio, json, os, signal, time
+from collections import OrderedDict, deque
+import httpx
 from dotenv import load_dotenv
 import google.generativeai as genai
+from session_builder import SessionBuilder
+from step_stream import StepStream, validate_step
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
+# Point WEATHER_API_URL at stub_weather_server.py to run the agent without wttr.in
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://wttr.in")
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "15"))
+MAX_CONCURRENT_TOOLS = int(os.getenv("MAX_CONCURRENT_TOOLS", "4"))
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))  # Seconds; 0 disables caching
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "1024"))
+COMMAND_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", "30"))
+COMMAND_PIPE_GRACE = float(os.getenv("COMMAND_PIPE_GRACE", "0.5"))  # Seconds to drain output once a command exits
+MAX_CONCURRENT_COMMANDS = int(os.getenv("MAX_CONCURRENT_COMMANDS", "2"))
+COMMAND_OUTPUT_LIMIT = int(os.getenv("COMMAND_OUTPUT_LIMIT", "4096"))  # Bytes kept from the end of stdout and of stderr
+
 def query_db(sql):
     pass
 
-def run_command(command):
-    result = os.system(command=command)
+class OutputBuffer:
+    """Ring buffer keeping the last limit bytes written to it"""
+
+    def __init__(self, limit=COMMAND_OUTPUT_LIMIT):
+        self.limit = limit
+        self.chunks = deque()
+        self.size = 0
+        self.total = 0
+
+    def write(self, data):
+        self.total += len(data)
+        self.chunks.append(data[-self.limit:])
+        self.size += len(self.chunks[-1])
+        while self.size > self.limit:
+            excess = self.size - self.limit
+            if len(self.chunks[0]) <= excess:
+                self.size -= len(self.chunks.popleft())
+            else:
+                self.chunks[0] = self.chunks[0][excess:]
+                self.size -= excess
+
+    def text(self):
+        text = b"".join(self.chunks).decode("utf-8", errors="replace")
+        dropped = self.total - self.size
+        if dropped:
+            return f"… ({dropped} earlier bytes dropped)\n{text}"
+        return text
+
+class CommandProtocol(asyncio.SubprocessProtocol):
+    """Drains a command's output into ring buffers as it arrives and reports when it exits and when its pipes close"""
+
+    def __init__(self, loop):
+        self.stdout, self.stderr = OutputBuffer(), OutputBuffer()
+        self.exited = loop.create_future()
+        self.pipes_closed = loop.create_future()
+        self.open_pipes = {1, 2}
+
+    def pipe_data_received(self, fd, data):
+        (self.stdout if fd == 1 else self.stderr).write(data)
+
+    def pipe_connection_lost(self, fd, exc):
+        self.open_pipes.discard(fd)
+        if not self.open_pipes and not self.pipes_closed.done():
+            self.pipes_closed.set_result(None)
+
+    def process_exited(self):
+        if not self.exited.done():
+            self.exited.set_result(None)
+
+async def run_command(command, runner):
+    async with runner.command_pool:
+        print("Tool called : run_command", command)
+        loop = asyncio.get_running_loop()
+        # Own process group, so a timeout also kills whatever the shell started
+        transport, protocol = await loop.subprocess_shell(
+            lambda: CommandProtocol(loop), command, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, start_new_session=True,
+        )
+        error = None
+        try:
+            done, _ = await asyncio.wait([protocol.exited], timeout=COMMAND_TIMEOUT)
+            if done:
+                # Processes it started in the background can hold the pipes open long after it exits
+                done, _ = await asyncio.wait([protocol.pipes_closed], timeout=COMMAND_PIPE_GRACE)
+                if not done:
+                    error = "Processes it started were still running when it exited and were killed"
+            else:
+                error = f"Timed out after {COMMAND_TIMEOUT}s and was killed"
+        finally:
+            # Timed out, cancelled by the runner or left processes behind; kill whatever is left of its group
+            if not (protocol.exited.done() and protocol.pipes_closed.done()):
+                try:
+                    os.killpg(transport.get_pid(), signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                await asyncio.wait([protocol.exited, protocol.pipes_closed], timeout=COMMAND_PIPE_GRACE)
+            # A process that left the group (setsid) survives the kill; closing the transport lets go of its pipes
+            transport.close()
+
+    result = {"exit_code": transport.get_returncode(), "stdout": protocol.stdout.text(), "stderr": protocol.stderr.text()}
+    if error:
+        result["error"] = error
     return result
 
-def get_weather(city: str):
-    print("Tool called : get_weather", city)
+class WeatherCache:
+    """TTL and size-bounded LRU cache for weather lookups
+
+    Concurrent lookups for the same city share one in-flight request.
+    """
+
+    def __init__(self, ttl=WEATHER_CACHE_TTL, max_entries=WEATHER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # city key -> (expires_at, report)
+        self.in_flight = {}  # city key -> asyncio.Task
+        self.hits = 0
+        self.coalesced = 0
+        self.upstream = 0
+
+    @staticmethod
+    def normalize(city):
+        return " ".join(str(city).split()).casefold()
 
-    url = f"https://wttr.in/{city}?format=%C+%t"
-    response = requests.get(url)
+    async def get(self, city, fetch):
+        """Return the cached report for city, or await fetch(key) once for all concurrent callers"""
+        key = self.normalize(city)
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self.entries[key]
 
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.upstream += 1
+            task = asyncio.ensure_future(fetch(key))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._store(key, done))
+        # Shielded so one caller timing out doesn't cancel the request for the others
+        return await asyncio.shield(task)
+
+    def _store(self, key, task):
+        self.in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or task.result() is None:
+            return  # Only successful reports are cached
+        if self.ttl <= 0:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, task.result())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.coalesced + self.upstream
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "upstream_requests": self.upstream,
+            "upstream_avoided": self.hits + self.coalesced,
+            "entries": len(self.entries),
+        }
+
+async def fetch_weather(city, runner):
+    url = f"{WEATHER_API_URL}/{city}?format=%C+%t"
+    response = await runner.http.get(url)
     if response.status_code == 200:
-        return f"The weather in {city} is {response.text}."
+        return response.text
+    return None
+
+async def get_weather(city: str, runner):
+    print("Tool called : get_weather", city)
+
+    report = await runner.weather_cache.get(city, lambda key: fetch_weather(key, runner))
+    if report is not None:
+        return f"The weather in {city} is {report}."
     return "Something went wrong"
 
 available_tools = {
@@ -29,7 +192,8 @@ available_tools = {
     },
     "run_command": {
         "fn" : run_command,
-        "description": "Takes a command as input to execute on system and returns output"
+        "description": "Takes a command as input to execute on system and returns its exit code and output",
+        "timeout" : None  # Enforces COMMAND_TIMEOUT itself, so partial output is kept
     }
 }
 
@@ -55,9 +219,13 @@ Output JSON Format:
     "input": "The input parameter for the function",
 }}
 
+If several tool calls do not depend on each other, request them together in one action step
+and they will run in parallel; the observation then lists every output:
+{{"step": "action", "calls": [{{"function": "get_weather", "input": "paris"}}, {{"function": "get_weather", "input": "tokyo"}}]}}
+
 Available Tools:
 - get_weather : Takes a city name as an input and returns the current weather for the city
-- run_command : Takes a command as input to execute on system and returns output
+- run_command : Takes a command as input to execute on system and returns its exit code and the end of its stdout and stderr
 
 Example:
 User Query: What is the weather of new york?
@@ -69,68 +237,110 @@ Output: {{"step": "output", "content": "The weather for new york seems to be 12
 
 """
 
-chat = genai.GenerativeModel("gemini-2.0-flash").start_chat()
-chat.send_message(system_prompt)
+class ToolRunner:
+    """Runs tool calls concurrently with a shared HTTP client, a timeout and a concurrency limit"""
 
-def try_parse_json(text):
-    try:
-        if text.startswith("```"):
-            lines = text.strip().splitlines()
-            text = "\n".join(line for line in lines if not line.startswith("```"))
-        return json.loads(text.strip())
-    except json.JSONDecodeError:
-        for line in text.splitlines():
+    def __init__(self, tools, max_concurrency=MAX_CONCURRENT_TOOLS, timeout=TOOL_TIMEOUT):
+        self.tools = tools
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # One pooled client for every tool call, so connections are reused
+        self.http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency * 2, max_keepalive_connections=max_concurrency),
+        )
+        self.weather_cache = WeatherCache()
+        self.command_pool = asyncio.Semaphore(MAX_CONCURRENT_COMMANDS)
+
+    async def run(self, function, tool_input):
+        tool = self.tools[function]
+        timeout = tool.get("timeout", self.timeout)
+        async with self.semaphore:
             try:
-                return json.loads(line.strip())
-            except json.JSONDecodeError:
-                continue
-    return None
+                return await asyncio.wait_for(tool["fn"](tool_input, self), timeout=timeout)
+            except asyncio.TimeoutError:
+                return f"{function} timed out after {timeout}s"
+            except Exception as e:
+                return f"{function} failed: {e}"
 
-    
-while True:
-    user_query = input('>>')
-    if not user_query:
-        continue
+    async def run_all(self, calls):
+        return await asyncio.gather(*(self.run(call["function"], call.get("input")) for call in calls))
 
-    chat.send_message(f"User query: {user_query}")
+    async def close(self):
+        await self.http.aclose()
+
+async def handle_query(chat, runner, user_query):
+    await chat.send_message_async(f"User query: {user_query}")
 
     while True:
         try:
-            response = chat.send_message("Next step")
-            parsed = try_parse_json(response.text)
+            # Steps are handled as soon as each JSON object in the streamed reply is complete
+            stream = StepStream(await chat.send_message_async("Next step", stream=True))
+            parsed = None
+            action = None
+            finished = False
+
+            async for parsed in stream:
+                if action or finished:
+                    continue  # The model ran ahead of the tool results; drain the rest of the reply
+
+                step = parsed.get("step")
+                content = parsed.get("content")
+                calls = parsed.get("calls") or [{"function": parsed.get("function"), "input": parsed.get("input")}]
+
+                if step == "plan":
+                    print(f"🧠 PLAN: {content}")
+                elif step == "action" and not validate_step(parsed) and \
+                        all(call["function"] in available_tools for call in calls):
+                    for call in calls:
+                        print(f"⚙️ ACTION: Calling {call['function']} with input: {call.get('input')}")
+                    action = (parsed, calls)
+                elif step == "observe":
+                    print(f"👀 OBSERVED: {content}")
+                elif step == "output":
+                    print(f"✅ FINAL ANSWER: {content}")
+                    finished = True
+                else:
+                    print(f"⚠️ Unknown step or error: {parsed}")
+                    finished = True
 
             if not parsed:
-                print("❌ Could not parse valid JSON. Response was:\n", response.text)
+                print("❌ Could not parse valid JSON. Response was:\n", stream.text)
+                break
+            if finished:
                 break
 
-            step = parsed.get("step")
-            content = parsed.get("content")
-            function = parsed.get("function")
-            tool_input = parsed.get("input")
-
-            if step == "plan":
-                print(f"🧠 PLAN: {content}")
-                continue
-            elif step == "action" and function in available_tools:
-                print(f"⚙️ ACTION: Calling {function} with input: {tool_input}")
-                output = available_tools[function]["fn"](tool_input)
-                chat.send_message(json.dumps({
+            if action:
+                parsed, calls = action
+                outputs = await runner.run_all(calls)
+                if "calls" in parsed:
+                    content = [{**call, "output": output} for call, output in zip(calls, outputs)]
+                else:
+                    content = outputs[0]
+                await chat.send_message_async(json.dumps({
                     "step" : "observe",
-                    "content" : output
+                    "content" : content
                 }))
-                continue
+        except Exception as e:
+            print(f"⚠️ Gemini error {e}")
+            break
 
-            elif step == "observe":
-                print(f"👀 OBSERVED: {content}")
-                continue
+async def main():
+    # The system prompt is the model's system instruction, so the session starts without a round trip
+    chat = SessionBuilder(system_prompt).start()
+    runner = ToolRunner(available_tools)
 
-            elif step == "output":
-                print(f"✅ FINAL ANSWER: {content}")
-                break
+    try:
+        while True:
+            user_query = await asyncio.to_thread(input, '>>')
+            if not user_query:
+                continue
+            await handle_query(chat, runner, user_query)
+    finally:
+        stats = runner.weather_cache.stats()
+        print(f"\nWeather cache: {stats['upstream_avoided']} of {stats['lookups']} lookups served without "
+              f"an upstream request ({stats['hits']} hits, {stats['coalesced']} coalesced)")
+        await runner.close()
 
-            else:
-                print(f"⚠️ Unknown step or error: {parsed}")
-                break
-        except Exception as e:
-            print(f"⚠️ Gemini error {e}")
-            break
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())